@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from services.rollups import ROLLUP_COLLECTION, RollupAccumulator
+from services.visitor_sketches import VisitorSketchManager
+from config.database import db_manager
+from dotenv import load_dotenv
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+BATCH_SIZE = 5000
+
+async def backfill_analytics(days=None):
+    """Rebuild hourly/daily rollups and visitor sketches from raw events.
+    
+    Buckets written while this runs are overwritten, so run it before
+    ingestion starts or during a quiet period. Sketches are stored under
+    their own ids and merged with the live ones, so they never double count.
+    """
+    db = db_manager.get_database()
+    query = {}
+    if days is not None:
+        # Start on a day boundary so every rebuilt bucket is complete
+        start = (datetime.utcnow() - timedelta(days=days)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        query["timestamp"] = {"$gte": start}
+    
+    accumulator = RollupAccumulator()
+    sketches = VisitorSketchManager(owner="backfill")
+    sketches.attach(db)
+    projections = {
+        "page_views": {
+            "_id": 0, "timestamp": 1, "page": 1, "referrer": 1,
+            "ip_address": 1, "user_agent": 1
+        },
+        "user_interactions": {"_id": 0, "timestamp": 1, "action": 1},
+    }
+    
+    for collection, projection in projections.items():
+        scanned = 0
+        current_day = None
+        cursor = db[collection].find(query, projection).sort("timestamp", 1).batch_size(BATCH_SIZE)
+        async for document in cursor:
+            accumulator.add(collection, [document])
+            if collection == "page_views":
+                # Events arrive in time order, so finished days can be
+                # written out and released to keep memory flat
+                day = document["timestamp"].replace(hour=0, minute=0, second=0, microsecond=0)
+                if current_day is not None and day != current_day:
+                    await sketches.persist()
+                    sketches.evict_before(day)
+                current_day = day
+                sketches.add_page_views([document])
+            scanned += 1
+        print(f"Scanned {scanned} documents from {collection}")
+    
+    # Overwrite rather than increment so the backfill can be re-run safely
+    operations = accumulator.replacements()
+    for i in range(0, len(operations), 1000):
+        await db[ROLLUP_COLLECTION].bulk_write(operations[i:i + 1000], ordered=False)
+    
+    print(f"✅ Rebuilt {len(operations)} rollup buckets")
+    
+    await sketches.persist()
+    print("✅ Rebuilt visitor sketches")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild analytics rollups and visitor sketches from raw events")
+    parser.add_argument("--days", type=int, default=None, help="Only rebuild the last N days")
+    args = parser.parse_args()
+    
+    await db_manager.connect(create_indexes=False)
+    await backfill_analytics(args.days)
+    await db_manager.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())
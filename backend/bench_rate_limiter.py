@@ -0,0 +1,89 @@
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from middleware.rate_limiting import MemoryRateLimitStore, RateLimiter, SharedRateLimitStore
+
+class SlidingWindowLimiter:
+    """The previous timestamp-list limiter, kept here as the baseline"""
+
+    def __init__(self, requests_per_minute: int = 60):
+        self.requests_per_minute = requests_per_minute
+        self.requests = {}
+
+    def check(self, client_id: str, now: float):
+        if client_id in self.requests:
+            self.requests[client_id] = [t for t in self.requests[client_id] if now - t < 60]
+        else:
+            self.requests[client_id] = []
+        if len(self.requests[client_id]) >= self.requests_per_minute:
+            return False, int(min(self.requests[client_id]) + 60 - now)
+        self.requests[client_id].append(now)
+        return True, 0
+
+class DictBaseline:
+    """A bare dict read and write per check, for the cost of touching per-client state.
+
+    Per-check work in the GCRA stores does not depend on the number of
+    clients, but the time does: once the state outgrows the CPU caches
+    every check misses on the key and its entry. This row shows that
+    floor, so the limiters can be compared against it at each size.
+    """
+
+    def __init__(self):
+        self.state = {}
+
+    def check(self, client_id: str, now: float):
+        key = f"default:{client_id}"
+        self.state[key] = self.state.get(key, now) + 1.0
+        return True, 0
+
+def run(limiter, clients: int, calls: int, seed: int = 0):
+    """Time `calls` checks spread over `clients` ids; returns ns per call"""
+    rng = random.Random(seed)
+    ids = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+    sequence = [ids[rng.randrange(clients)] for _ in range(calls)]
+
+    # Warm up so every client has state, as in a long-running process
+    now = 1000.0
+    for client_id in ids:
+        limiter.check(client_id, now)
+
+    started = time.perf_counter()
+    for i, client_id in enumerate(sequence):
+        limiter.check(client_id, now + i * 1e-5)
+    return (time.perf_counter() - started) / calls * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rate limiter against the old sliding window")
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--rpm", type=int, default=100)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 100, 1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    print(f"{'clients':>8} {'limiter':>15} {'ns/call':>10} {'state':>10}")
+    for clients in args.clients:
+        shared_path = os.path.join(tempfile.mkdtemp(), "ratelimit.bin")
+        for name, limiter in (
+            ("gcra", RateLimiter(args.rpm, store=MemoryRateLimitStore(max_clients=max(clients, 100_000)))),
+            ("gcra-shared", RateLimiter(args.rpm, store=SharedRateLimitStore(shared_path, slots=1 << 18))),
+            ("sliding-window", SlidingWindowLimiter(requests_per_minute=args.rpm)),
+            ("dict-baseline", DictBaseline()),
+        ):
+            ns_per_call = run(limiter, clients, args.calls)
+            store = getattr(limiter, "store", None)
+            state = len(store.clients) if isinstance(store, MemoryRateLimitStore) else len(getattr(limiter, "requests", getattr(limiter, "state", ())))
+            print(f"{clients:>8} {name:>15} {ns_per_call:>10.0f} {state if state else '-':>10}")
+        os.unlink(shared_path)
+
+    # Once every client has gone quiet the GCRA state is evicted entirely
+    store = MemoryRateLimitStore()
+    run(RateLimiter(args.rpm, store=store), args.clients[-1], args.calls)
+    evicted = store.evict_idle(time.monotonic() + 10_000)
+    print(f"idle eviction: {evicted} clients dropped, {len(store.clients)} left")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from models.analytics import PageView
+from server import StatusCheck
+
+def status_documents(count: int):
+    now = datetime.utcnow()
+    return [
+        {"id": str(uuid.uuid4()), "client_name": f"client-{i}", "timestamp": now - timedelta(seconds=i)}
+        for i in range(count)
+    ]
+
+def page_view_documents(count: int):
+    now = datetime.utcnow()
+    return [
+        PageView(
+            page=f"/projects/{i % 20}", user_agent="Mozilla/5.0 (X11; Linux x86_64)",
+            ip_address=f"10.0.{i % 256}.{i // 256 % 256}", referrer="https://www.google.com/",
+            session_id=f"session-{i % 300}", timestamp=now - timedelta(seconds=i), duration=i % 120
+        ).dict()
+        for i in range(count)
+    ]
+
+def build_app(documents, model) -> FastAPI:
+    """Same documents served the old way (validate, encode) and the new way (pass through)"""
+    app = FastAPI()
+
+    @app.get("/before", response_model=List[model], response_class=JSONResponse)
+    async def before():
+        return [model(**document) for document in documents]
+
+    @app.get("/after", response_model=List[model])
+    async def after():
+        return ORJSONResponse(documents)
+
+    return app
+
+async def request(app, path: str) -> bytes:
+    """Drive one GET through the ASGI app in-process, returning the body"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+async def bench(app, path: str, iterations: int) -> float:
+    """Milliseconds per request"""
+    await request(app, path)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await request(app, path)
+    return (time.perf_counter() - started) / iterations * 1000
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark list endpoint serialization per 1000 documents")
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    per_thousand = 1000 / args.documents
+    for name, documents, model in (
+        ("GET /status", status_documents(args.documents), StatusCheck),
+        ("GET /analytics/page-views", page_view_documents(args.documents), PageView),
+    ):
+        app = build_app(documents, model)
+        before = await bench(app, "/before", args.iterations) * per_thousand
+        after = await bench(app, "/after", args.iterations) * per_thousand
+        print(f"{name:>26}: {before:7.2f} ms -> {after:6.2f} ms per 1000 docs ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+import argparse
+import gc
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import numpy as np
+from services.sessionization import SESSION_TIMEOUT, EventColumns, build_sessions, sessionize_arrays
+
+def generate_events(count: int, sessions: int, seed: int = 7):
+    """Page views and interactions as Mongo returns them, spread over a week.
+
+    Each visitor's events are a minute or two apart, with an occasional
+    multi-hour gap so some visitors come back for a second session.
+    """
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    session_of = np.sort(rng.integers(0, sessions, count))
+    gaps = rng.exponential(90_000, count)
+    gaps[rng.random(count) < 0.02] = 2 * 3600 * 1000
+    # Per-visitor running sum of the gaps, starting from a random visit time
+    elapsed = np.cumsum(gaps)
+    first = np.searchsorted(session_of, session_of)
+    offsets = rng.integers(0, 7 * 24 * 3600 * 1000, sessions)[session_of] + (elapsed - elapsed[first]).astype(np.int64)
+    pages = rng.integers(0, 50, count).tolist()
+    views = (rng.random(count) < 0.7).tolist()
+
+    page_views, interactions = [], []
+    for offset, session, page, view in zip(offsets.tolist(), session_of.tolist(), pages, views):
+        document = {
+            "session_id": f"session-{session}",
+            "timestamp": now - timedelta(milliseconds=offset),
+            "page": f"/page/{page}",
+        }
+        if view:
+            document["user_agent"] = "Mozilla/5.0 (X11; Linux x86_64)"
+            document["ip_address"] = f"10.0.{session % 256}.{session // 256 % 256}"
+            page_views.append(document)
+        else:
+            interactions.append(document)
+    return page_views, interactions
+
+def naive_sessions(page_views, interactions, timeout: timedelta):
+    """Per-document reference implementation: group, sort and walk each session"""
+    events = defaultdict(list)
+    for document in page_views:
+        events[document["session_id"]].append((document["timestamp"], True, document["page"]))
+    for document in interactions:
+        events[document["session_id"]].append((document["timestamp"], False, document["page"]))
+    sessions = []
+    for key, rows in events.items():
+        rows.sort()
+        current = None
+        for timestamp, is_view, page in rows:
+            if current is None or timestamp - current["end_time"] > timeout:
+                current = {"start_time": timestamp, "end_time": timestamp, "pages": [], "interactions": 0}
+                sessions.append(current)
+            current["end_time"] = timestamp
+            if is_view:
+                if page not in current["pages"]:
+                    current["pages"].append(page)
+            else:
+                current["interactions"] += 1
+    for session in sessions:
+        session["total_duration"] = int((session["end_time"] - session["start_time"]).total_seconds())
+        session["is_bounce"] = len(session["pages"]) <= 1 and session["interactions"] == 0
+    return sessions
+
+def summarize(sessions):
+    return (
+        len(sessions),
+        sum(session["total_duration"] for session in sessions),
+        sum(session["is_bounce"] for session in sessions),
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized sessionization")
+    parser.add_argument("--events", type=int, default=2_000_000)
+    parser.add_argument("--sessions", type=int, default=200_000, help="Distinct session ids")
+    parser.add_argument("--skip-naive", action="store_true", help="Skip the per-document baseline")
+    args = parser.parse_args()
+
+    page_views, interactions = generate_events(args.events, args.sessions)
+    print(f"{len(page_views)} page views, {len(interactions)} interactions")
+    # The service drops each fetched batch once it is in the columns; keep
+    # the generated documents out of the collector's way to match that
+    gc.freeze()
+
+    started = time.perf_counter()
+    columns = EventColumns()
+    columns.add_page_views(page_views)
+    columns.add_interactions(interactions)
+    arrays = columns.arrays()
+    loaded = time.perf_counter()
+    sessionize_arrays(*arrays, int(SESSION_TIMEOUT.total_seconds() * 1000))
+    core = time.perf_counter()
+    sessions = build_sessions(columns)
+    built = time.perf_counter()
+    print(f"  load columns: {(loaded - started) * 1000:8.0f} ms")
+    print(f"  sessionize:   {(core - loaded) * 1000:8.0f} ms (sort, split, reductions)")
+    print(f"  documents:    {(built - core) * 1000:8.0f} ms ({len(sessions)} sessions, sessionizing again)")
+
+    if not args.skip_naive:
+        started = time.perf_counter()
+        reference = naive_sessions(page_views, interactions, SESSION_TIMEOUT)
+        naive_ms = (time.perf_counter() - started) * 1000
+        print(f"  per-document: {naive_ms:8.0f} ms")
+        assert summarize(reference) == summarize(sessions), (summarize(reference), summarize(sessions))
+        print("✅ Vectorized sessions match the per-document reference")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import sys
+from config.indexes import ensure_indexes, route_queries
+from config.database import db_manager
+from dotenv import load_dotenv
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+def _stages(plan):
+    """Yield every stage name in an explain plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+async def explain(db, query):
+    collection = db[query["collection"]]
+    if "pipeline" in query:
+        return await db.command(
+            "explain",
+            {"aggregate": query["collection"], "pipeline": query["pipeline"], "cursor": {}},
+            verbosity="queryPlanner"
+        )
+    cursor = collection.find(query["filter"])
+    if query.get("sort"):
+        cursor = cursor.sort(query["sort"])
+    return await cursor.explain()
+
+async def check_indexes(ensure=False):
+    """Explain every known route query and report any collection scans"""
+    db = db_manager.get_database()
+    if ensure:
+        await ensure_indexes(db)
+    
+    failures = []
+    for query in route_queries():
+        plan = await explain(db, query)
+        stages = set(_stages(plan.get("queryPlanner", plan)))
+        if "COLLSCAN" in stages:
+            failures.append(query["name"])
+            print(f"❌ {query['name']} ({query['collection']}): COLLSCAN")
+        else:
+            print(f"✅ {query['name']} ({query['collection']}): {', '.join(sorted(stages))}")
+    
+    return failures
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fail if any route query does a collection scan")
+    parser.add_argument("--ensure", action="store_true", help="Build missing indexes before checking")
+    args = parser.parse_args()
+    
+    # Skip the startup index build so the check reflects the current state
+    await db_manager.connect(create_indexes=False)
+    failures = await check_indexes(args.ensure)
+    await db_manager.disconnect()
+    
+    if failures:
+        print(f"{len(failures)} route queries do a COLLSCAN")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
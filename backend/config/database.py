@@ -1,33 +1,41 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from config.indexes import ensure_indexes
+from config.monitoring import command_metrics, pool_metrics
+import asyncio
 import os
 import logging
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
 class DatabaseManager:
     """MongoDB connection manager with optimization"""
     
     def __init__(self):
         self.client: Optional[AsyncIOMotorClient] = None
         self.database = None
+        self._index_task: Optional[asyncio.Task] = None
         
-    async def connect(self):
+    async def connect(self, create_indexes: bool = True):
         """Connect to MongoDB with optimized settings"""
         try:
             mongo_url = os.environ['MONGO_URL']
             db_name = os.environ['DB_NAME']
             
-            # Connection with optimization settings
+            # Connection with optimization settings, tunable per deployment
             self.client = AsyncIOMotorClient(
                 mongo_url,
-                maxPoolSize=10,          # Maximum connections in pool
-                minPoolSize=1,           # Minimum connections in pool
-                maxIdleTimeMS=30000,     # Close connections after 30s idle
-                waitQueueTimeoutMS=5000, # Wait max 5s for connection
-                serverSelectionTimeoutMS=5000,  # Server selection timeout
-                connectTimeoutMS=10000,  # Connection timeout
-                socketTimeoutMS=20000,   # Socket timeout
+                maxPoolSize=_env_int('MONGO_MAX_POOL_SIZE', 10),             # Maximum connections in pool
+                minPoolSize=_env_int('MONGO_MIN_POOL_SIZE', 1),              # Minimum connections in pool
+                maxIdleTimeMS=_env_int('MONGO_MAX_IDLE_TIME_MS', 30000),     # Close idle connections
+                waitQueueTimeoutMS=_env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000),  # Wait for a connection
+                serverSelectionTimeoutMS=_env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+                connectTimeoutMS=_env_int('MONGO_CONNECT_TIMEOUT_MS', 10000),
+                socketTimeoutMS=_env_int('MONGO_SOCKET_TIMEOUT_MS', 20000),
+                event_listeners=[pool_metrics, command_metrics],
             )
             
             self.database = self.client[db_name]
@@ -36,40 +44,41 @@ class DatabaseManager:
             await self.client.admin.command('ping')
             logger.info("✅ Connected to MongoDB successfully")
             
-            # Create indexes for better performance
-            await self.create_indexes()
+            # Verify and build indexes in the background so a large build
+            # does not hold up startup
+            if create_indexes:
+                self._index_task = asyncio.create_task(self.create_indexes())
             
         except Exception as e:
             logger.error(f"❌ Failed to connect to MongoDB: {e}")
             raise
     
     async def create_indexes(self):
-        """Create database indexes for better query performance"""
+        """Bring indexes in line with the registry in config/indexes.py"""
         try:
-            # Portfolio collection indexes
-            await self.database.portfolio.create_index("id")
-            await self.database.portfolio.create_index("updated_at")
-            
-            # Contact messages indexes
-            await self.database.contact_messages.create_index("id")
-            await self.database.contact_messages.create_index("created_at")
-            await self.database.contact_messages.create_index("read")
-            await self.database.contact_messages.create_index([
-                ("created_at", -1),  # Descending order for recent first
-                ("read", 1)
-            ])
-            
-            logger.info("✅ Database indexes created successfully")
+            await ensure_indexes(self.database)
+            logger.info("✅ Database indexes verified successfully")
             
         except Exception as e:
             logger.warning(f"⚠️ Failed to create indexes: {e}")
     
     async def disconnect(self):
         """Close database connection"""
+        if self._index_task and not self._index_task.done():
+            self._index_task.cancel()
         if self.client:
             self.client.close()
+            self.client = None
+            self.database = None
             logger.info("✅ Disconnected from MongoDB")
     
+    async def ping(self) -> bool:
+        """Check the server is reachable over the pooled client"""
+        if self.client is None:
+            return False
+        await self.client.admin.command('ping')
+        return True
+    
     def get_database(self):
         """Get database instance"""
         if self.database is None:
@@ -0,0 +1,163 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Raw analytics events are kept forever unless this is set, in which case
+# they expire after that many days and rollups and visitor sketches keep
+# the long-term history. Opt-in: a TTL index deletes existing events as
+# soon as it is built.
+ANALYTICS_RETENTION_DAYS = os.environ.get("ANALYTICS_RETENTION_DAYS")
+
+def _timestamp_index() -> IndexModel:
+    if ANALYTICS_RETENTION_DAYS:
+        return IndexModel(
+            [("timestamp", ASCENDING)],
+            expireAfterSeconds=int(ANALYTICS_RETENTION_DAYS) * 24 * 60 * 60
+        )
+    return IndexModel([("timestamp", ASCENDING)])
+
+# Declarative index registry: every index the application relies on, per
+# collection. Compound indexes put the equality field before the timestamp
+# range/sort field so filtered queries stay on a tight index range.
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "portfolio": [
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+    "contact_messages": [
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)]),
+        IndexModel([("read", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("read", ASCENDING)]),
+        # Keyset pagination order
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "page_views": [
+        # Serves unfiltered time windows and, with a retention set, expires old events
+        _timestamp_index(),
+        # Keyset pagination order, unfiltered and by page
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("page", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "user_interactions": [
+        _timestamp_index(),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("action", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("page", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "status_checks": [
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "analytics_rollups": [
+        IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING)]),
+    ],
+    "analytics_sketches": [
+        IndexModel([("day", ASCENDING), ("page", ASCENDING)]),
+    ],
+    "analytics_sessions": [
+        # Window summaries and removing sessions a recomputation dropped
+        IndexModel([("start_time", ASCENDING)]),
+        # Batch refreshes upserting sessions by their stable id
+        IndexModel([("id", ASCENDING)]),
+        # Streaming tracker merging into an overlapping session
+        IndexModel([("session_id", ASCENDING), ("end_time", ASCENDING)]),
+    ],
+}
+
+# Options that make two indexes on the same keys behave differently
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+def _index_drift(expected: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Describe how an existing index differs from its registry entry"""
+    differences = []
+    if list(expected["key"].items()) != list(current["key"].items()):
+        differences.append(f"key {dict(current['key'])} != {dict(expected['key'])}")
+    for option in _COMPARED_OPTIONS:
+        if expected.get(option) != current.get(option):
+            differences.append(f"{option} {current.get(option)!r} != {expected.get(option)!r}")
+    return differences
+
+async def ensure_indexes(database) -> Dict[str, List[str]]:
+    """Diff the registry against list_indexes and build what is missing.
+
+    Drift (changed options, unregistered indexes) is only logged; fixing it
+    means dropping an index, which is left to an operator.
+    Returns the names of the indexes created per collection.
+    """
+    created: Dict[str, List[str]] = {}
+    for collection, models in INDEX_REGISTRY.items():
+        existing = {
+            index["name"]: index
+            async for index in database[collection].list_indexes()
+        }
+
+        missing = []
+        for model in models:
+            expected = model.document
+            current = existing.get(expected["name"])
+            if current is None:
+                missing.append(model)
+                continue
+            for difference in _index_drift(expected, current):
+                logger.warning(f"⚠️ Index drift on {collection}.{expected['name']}: {difference}")
+
+        registered = {model.document["name"] for model in models} | {"_id_"}
+        for name in set(existing) - registered:
+            logger.warning(f"⚠️ Unregistered index {collection}.{name}")
+
+        if missing:
+            created[collection] = await database[collection].create_indexes(missing)
+            logger.info(f"✅ Created indexes on {collection}: {', '.join(created[collection])}")
+
+    return created
+
+def route_queries() -> List[Dict[str, Any]]:
+    """Representative queries issued by the API routes, for explain() checks.
+
+    Each entry has a name, a collection and either a find filter (with an
+    optional sort) or an aggregation pipeline.
+    """
+    end = datetime.utcnow()
+    start = end - timedelta(days=30)
+    window = {"timestamp": {"$gte": start, "$lte": end}}
+    newest = [("timestamp", DESCENDING), ("id", DESCENDING)]
+
+    # Imported here to keep the registry free of service imports at load time
+    from services.rollups import ROLLUP_COLLECTION, RollupManager
+    from services.visitor_sketches import SKETCH_COLLECTION, ALL_PAGES
+    from services.sessionization import SESSION_COLLECTION
+    from routes.analytics import exact_unique_visitors_pipeline
+
+    return [
+        {"name": "page views window", "collection": "page_views",
+         "filter": window, "sort": newest},
+        {"name": "page views by page", "collection": "page_views",
+         "filter": {**window, "page": "/"}, "sort": newest},
+        {"name": "exact unique visitors", "collection": "page_views",
+         "pipeline": exact_unique_visitors_pipeline(start, end, ["/"])},
+        {"name": "interactions window", "collection": "user_interactions",
+         "filter": window, "sort": newest},
+        {"name": "interactions by action", "collection": "user_interactions",
+         "filter": {**window, "action": "click"}, "sort": newest},
+        {"name": "interactions by page", "collection": "user_interactions",
+         "filter": {**window, "page": "/"}, "sort": newest},
+        {"name": "contact messages", "collection": "contact_messages",
+         "filter": {}, "sort": [("created_at", DESCENDING), ("id", DESCENDING)]},
+        {"name": "status checks", "collection": "status_checks",
+         "filter": {}, "sort": newest},
+        {"name": "recent contacts", "collection": "contact_messages",
+         "filter": {"created_at": {"$gte": start, "$lte": end}},
+         "sort": [("created_at", DESCENDING)]},
+        {"name": "mark message read", "collection": "contact_messages",
+         "filter": {"id": "message-id"}},
+        {"name": "rollup buckets", "collection": ROLLUP_COLLECTION,
+         "filter": RollupManager.bucket_query(start, end)},
+        {"name": "visitor sketches", "collection": SKETCH_COLLECTION,
+         "filter": {"day": {"$gte": start, "$lte": end}, "page": {"$in": ["/", ALL_PAGES]}}},
+        {"name": "session summary", "collection": SESSION_COLLECTION,
+         "pipeline": [{"$match": {"start_time": {"$gte": start, "$lte": end}}}, {"$count": "sessions"}]},
+    ]
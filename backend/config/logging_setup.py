@@ -0,0 +1,166 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+
+class SamplingRule(NamedTuple):
+    """Keep 1 in `rate` records from `logger` whose `attribute` starts with `prefix`"""
+    logger: str
+    prefix: str
+    rate: int
+    attribute: str = "msg"
+
+# High-volume INFO records. WARNING and above are never sampled.
+LOG_SAMPLING_RULES: List[SamplingRule] = [
+    SamplingRule("middleware.cache", "Cache HIT", 100),
+    SamplingRule("middleware.cache", "Cache STALE", 10),
+    SamplingRule("middleware.shared_cache", "Cache HIT", 100),
+    SamplingRule("middleware.shared_cache", "Cache STALE", 10),
+    SamplingRule("middleware.security", "/api/health", 100, attribute="path"),
+    SamplingRule("middleware.security", "/api/analytics/", 10, attribute="path"),
+]
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including fields passed via `extra=`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Drop all but 1 in N matching records; kept ones carry `sample_rate`"""
+
+    def __init__(self, rules: List[SamplingRule]):
+        super().__init__()
+        self._rules: Dict[str, List[SamplingRule]] = {}
+        for rule in rules:
+            self._rules.setdefault(rule.logger, []).append(rule)
+        # itertools.count is advanced atomically under the GIL
+        self._counters = {rule: itertools.count() for rule in rules}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rules = self._rules.get(record.name)
+        if not rules:
+            return True
+        for rule in rules:
+            value = getattr(record, rule.attribute, None)
+            if isinstance(value, str) and value.startswith(rule.prefix):
+                if next(self._counters[rule]) % rule.rate:
+                    return False
+                record.sample_rate = rule.rate
+                return True
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render tracebacks here, since they may reference
+        # objects that change before the writer thread gets to them
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+# Loggers that uvicorn configures with their own synchronous stream handlers
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Set by setup_logging()
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging() -> None:
+    """Route all logging through a queue drained by a background writer thread.
+
+    The root logger only enqueues records, and uvicorn's loggers propagate
+    to it instead of writing themselves, so logging never does I/O on the
+    event loop. The writer thread emits JSON lines to stdout and to a
+    size-rotated file. Configured by LOG_LEVEL, LOG_FILE, LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT and LOG_QUEUE_SIZE.
+    """
+    global _queue_handler, _listener
+    if _listener is not None:
+        return
+
+    formatter = JsonFormatter()
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+    log_file = os.environ.get("LOG_FILE", "/tmp/portfolio_api.log")
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+            backupCount=int(os.environ.get("LOG_BACKUP_COUNT", 5))
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(int(os.environ.get("LOG_QUEUE_SIZE", 10000))))
+    _queue_handler.addFilter(SamplingFilter(LOG_SAMPLING_RULES))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    # uvicorn installs its logging config before importing the app; send its
+    # records through the queue too, so access logs never write on the loop
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        for handler in list(uvicorn_logger.handlers):
+            uvicorn_logger.removeHandler(handler)
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Drain queued records (including shutdown messages) at exit
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Flush the queue and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def logging_stats() -> Dict[str, Any]:
+    """Queue depth and records dropped because the queue was full"""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
@@ -0,0 +1,232 @@
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+import threading
+import time
+
+# Latency buckets in seconds, from cache hits to slow aggregations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+# (labels, value) pairs reported by a collector
+Samples = Iterable[Tuple[Dict[str, str], float]]
+
+class Metric:
+    """Base for registry metrics: a name, help text and label names.
+
+    Writers on other threads hold `lock` while updating; exports copy the
+    values under it before iterating.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), lock: Optional[threading.Lock] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = lock if lock is not None else threading.Lock()
+
+    def _labels(self, values: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+class Counter(Metric):
+    """Monotonic counter per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), lock: Optional[threading.Lock] = None):
+        super().__init__(name, help, labelnames, lock)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            yield self.name, self._labels(labels), value
+
+class Gauge(Counter):
+    """Value that can go up and down per label set"""
+
+    kind = "gauge"
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        self.values[labels] = value
+
+    def dec(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+class Histogram(Metric):
+    """Bucketed observations per label set.
+
+    Each label set keeps per-bucket (non-cumulative) counts plus a sum;
+    cumulative counts are only computed on export.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        lock: Optional[threading.Lock] = None
+    ):
+        super().__init__(name, help, labelnames, lock)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket..., count above the last bucket, sum]
+        self.values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def series(self) -> List[Tuple[LabelValues, List[float]]]:
+        """Copy of every label set's counts, taken under the lock"""
+        with self.lock:
+            return [(labels, list(series)) for labels, series in self.values.items()]
+
+    def snapshot(self, series: List[float]) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip((*self.buckets, math.inf), series):
+            cumulative += count
+            buckets["+Inf" if bound == math.inf else repr(bound)] = cumulative
+        return {"buckets": buckets, "count": cumulative, "sum": series[-1]}
+
+    def samples(self):
+        for labels, series in self.series():
+            label_dict = self._labels(labels)
+            snapshot = self.snapshot(series)
+            for bound, count in snapshot["buckets"].items():
+                yield f"{self.name}_bucket", {**label_dict, "le": bound}, count
+            yield f"{self.name}_sum", label_dict, snapshot["sum"]
+            yield f"{self.name}_count", label_dict, snapshot["count"]
+
+class CollectedMetric(Metric):
+    """Metric whose samples are read from another component at scrape time"""
+
+    def __init__(self, name: str, help: str, kind: str, collect: Callable[[], Samples]):
+        super().__init__(name, help)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name, labels, value
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class MetricsRegistry:
+    """Per-process metrics registry.
+
+    Request-path updates run on the event loop thread, so plain dict and
+    list updates need no locks. Metrics updated from driver threads are
+    written under their `lock` (pass a component's own lock to share it),
+    and exports always copy values under the lock before iterating.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.started_at = time.time()
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, help: str, labelnames: Sequence[str] = (), lock: Optional[threading.Lock] = None
+    ) -> Counter:
+        return self.register(Counter(name, help, labelnames, lock))
+
+    def gauge(
+        self, name: str, help: str, labelnames: Sequence[str] = (), lock: Optional[threading.Lock] = None
+    ) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, lock))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        lock: Optional[threading.Lock] = None
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets, lock))
+
+    def collector(self, name: str, help: str, kind: str, collect: Callable[[], Samples]) -> CollectedMetric:
+        """Register a metric read from `collect()` at scrape time"""
+        return self.register(CollectedMetric(name, help, kind, collect))
+
+    def unregister(self, name: str) -> None:
+        self.metrics.pop(name, None)
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    rendered = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{rendered}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> Dict[str, Any]:
+        """All metrics as {name: {type, help, samples}}"""
+        exported = {}
+        for metric in self.metrics.values():
+            if isinstance(metric, Histogram):
+                samples = [
+                    {"labels": metric._labels(labels), **metric.snapshot(series)}
+                    for labels, series in metric.series()
+                ]
+            else:
+                samples = [{"labels": labels, "value": value} for _, labels, value in metric.samples()]
+            exported[metric.name] = {"type": metric.kind, "help": metric.help, "samples": samples}
+        return exported
+
+    def value(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        """Sum of a counter or gauge's samples matching the given labels"""
+        labels = labels or {}
+        return sum(
+            value for _, sample_labels, value in self.metrics[name].samples()
+            if all(sample_labels.get(key) == val for key, val in labels.items())
+        )
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+# HTTP metrics, recorded by MetricsMiddleware
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by method, route template and status",
+    ("method", "route", "status")
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method, route template and status",
+    ("method", "route", "status")
+)
+http_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests currently being served")
+metrics.collector(
+    "process_uptime_seconds", "Seconds since this worker process started", "gauge",
+    lambda: [({}, round(time.time() - metrics.started_at, 3))]
+)
@@ -0,0 +1,210 @@
+from pymongo import monitoring
+from collections import deque
+from config.metrics import metrics
+import os
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener tracking checkout waits and connections in use.
+
+    Pool events fire on the driver's worker threads; a checkout starts and
+    completes on the same thread, so the wait is timed with a thread-local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.open_connections = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.pools_cleared = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_use": self.in_use,
+                "open_connections": self.open_connections,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_wait_ms": {
+                    "avg": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                    "max": round(self.wait_max_ms, 3),
+                },
+                "pools_cleared": self.pools_cleared,
+            }
+
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait_ms = self._wait_ms()
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def connection_check_out_failed(self, event):
+        self._wait_ms()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+# Global pool metrics, registered on the DatabaseManager client
+pool_metrics = PoolMetrics()
+
+# Connection handshake and auth commands, which say nothing about queries
+_IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "saslStart", "saslContinue", "endSessions"}
+
+# Command fields that hold a query or pipeline, redacted for the slow log
+_SHAPE_FIELDS = ("filter", "query", "pipeline", "sort", "updates", "deletes")
+
+def redact(value: Any) -> Any:
+    """Shape of a query with every literal replaced by "?"
+
+    Field names and operators are kept, so the slow log shows which
+    fields and operators a query used without leaking visitor data.
+    """
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = redact(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    if isinstance(value, str) and value.startswith("$"):
+        # Field path in an aggregation expression
+        return value
+    return "?"
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """Redacted filter/pipeline/sort of a command (updates and deletes by their query)"""
+    shape = {}
+    for field in _SHAPE_FIELDS:
+        if field not in command:
+            continue
+        value = command[field]
+        if field in ("updates", "deletes"):
+            value = [statement.get("q", {}) for statement in value]
+        if field == "sort":
+            # Sort directions are not sensitive and matter for index choice
+            shape[field] = dict(value)
+        else:
+            shape[field] = redact(value)
+    return shape
+
+class CommandMetrics(monitoring.CommandListener):
+    """Command listener recording latency per command and collection.
+
+    Events fire on the driver's threads, so metric updates take the lock
+    the metrics are exported under. Only the command's redacted filter
+    shape is kept while it runs; commands slower than slow_ms are logged
+    with it and kept in a short list of recent slow queries.
+    """
+
+    def __init__(self, slow_ms: float = 100.0, recent_slow: int = 50):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        # (connection, request id) -> (command name, collection, redacted shape)
+        self._started: Dict[Tuple[Any, int], Tuple[str, str, Dict[str, Any]]] = {}
+        self.recent_slow: deque = deque(maxlen=recent_slow)
+        self.duration = metrics.histogram(
+            "mongo_command_duration_seconds", "MongoDB command latency by command, collection and outcome",
+            ("command", "collection", "outcome"), lock=self._lock
+        )
+        self.slow_commands = metrics.counter(
+            "mongo_slow_commands_total", "MongoDB commands slower than the slow query threshold",
+            ("command", "collection"), lock=self._lock
+        )
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = ""
+        # Keep only the shape: the command document can be large and holds visitor data
+        shape = command_shape(event.command_name, event.command)
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (event.command_name, collection, shape)
+
+    def _finished(self, event, outcome: str):
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        command_name, collection, shape = started
+        duration_ms = event.duration_micros / 1000
+        with self._lock:
+            self.duration.observe(duration_ms / 1000, (command_name, collection, outcome))
+            if duration_ms >= self.slow_ms:
+                self.slow_commands.inc((command_name, collection))
+
+        if duration_ms >= self.slow_ms:
+            entry = {
+                "command": command_name,
+                "collection": collection,
+                "duration_ms": round(duration_ms, 2),
+                "outcome": outcome,
+                "shape": shape,
+                "at": time.time(),
+            }
+            self.recent_slow.append(entry)
+            logger.warning(
+                f"⚠️ Slow Mongo {command_name} on {collection or '-'}: {duration_ms:.1f}ms",
+                extra={key: entry[key] for key in ("command", "collection", "duration_ms", "shape")}
+            )
+
+    def succeeded(self, event):
+        self._finished(event, "ok")
+
+    def failed(self, event):
+        self._finished(event, "error")
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Most recent slow commands, newest first"""
+        return list(reversed(self.recent_slow))
+
+# Global command metrics, registered on the DatabaseManager client
+command_metrics = CommandMetrics(slow_ms=float(os.environ.get("MONGO_SLOW_QUERY_MS", 100)))
@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from services.analytics_export import EXPORT_BATCH_SIZE, EXPORT_COLLECTIONS, export_to_parquet, require_pyarrow
+from config.database import db_manager
+from dotenv import load_dotenv
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+def _date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+async def export_analytics(collections, start, end, output, batch_size):
+    """Export raw analytics events to day-partitioned Parquet under `output`"""
+    db = db_manager.get_database()
+    for collection in collections:
+        started = time.perf_counter()
+        writer = await export_to_parquet(db, collection, start, end, output, batch_size)
+        rows = sum(writer.rows.values())
+        elapsed = time.perf_counter() - started
+        print(
+            f"✅ {collection}: {rows} rows in {len(writer.files)} day partitions "
+            f"({elapsed:.1f}s, {rows / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+
+async def main():
+    parser = argparse.ArgumentParser(description="Export analytics events as day-partitioned Parquet")
+    parser.add_argument("output", help="Output directory (one sub-directory per collection)")
+    parser.add_argument("--start", type=_date, default=None, help="ISO date or datetime (default: 7 days ago)")
+    parser.add_argument("--end", type=_date, default=None, help="ISO date or datetime, exclusive (default: now)")
+    parser.add_argument("--collection", choices=EXPORT_COLLECTIONS, action="append",
+                        help="Collection to export (repeatable; default: all)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    
+    try:
+        require_pyarrow()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    end = args.end or datetime.utcnow()
+    start = args.start or end - timedelta(days=7)
+    
+    await db_manager.connect(create_indexes=False)
+    try:
+        await export_analytics(args.collection or EXPORT_COLLECTIONS, start, end, args.output, args.batch_size)
+    finally:
+        await db_manager.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())
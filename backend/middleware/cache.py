@@ -1,95 +1,454 @@
 from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 from functools import wraps
 import json
+import gzip
 import hashlib
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Awaitable, Callable, Iterable, Optional, Set, Tuple
+from collections import OrderedDict, defaultdict
+import asyncio
+import os
+import sys
 import time
 import logging
 
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
 logger = logging.getLogger(__name__)
 
+class CachedBody:
+    """A serialized response body with its compressed variants.
+    
+    Encoding happens once when the entry is stored, so cache hits only
+    pick the variant matching Accept-Encoding.
+    """
+    
+    __slots__ = ("body", "gzip", "br", "media_type")
+    
+    def __init__(self, body: bytes, media_type: str = "application/json", minimum_size: int = 1000):
+        self.body = body
+        self.media_type = media_type
+        compress = len(body) >= minimum_size
+        self.gzip = gzip.compress(body, compresslevel=9) if compress else None
+        self.br = brotli.compress(body, quality=11) if compress and brotli else None
+    
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + len(self.gzip or b"") + len(self.br or b"")
+    
+    def response(self, accept_encoding: str = "") -> Response:
+        """Build a raw Response using the best encoding the client accepts"""
+        accepted = {
+            encoding.split(";")[0].strip().lower()
+            for encoding in accept_encoding.split(",")
+        }
+        headers = {"Vary": "Accept-Encoding"}
+        
+        if self.br is not None and "br" in accepted:
+            content = self.br
+            headers["Content-Encoding"] = "br"
+        elif self.gzip is not None and "gzip" in accepted:
+            content = self.gzip
+            headers["Content-Encoding"] = "gzip"
+        else:
+            content = self.body
+        
+        return Response(content=content, media_type=self.media_type, headers=headers)
+
+def request_cache_key(request: Request) -> str:
+    """Cache key for a request: method, path and query string"""
+    key_data = f"{request.method}:{request.url.path}:{request.url.query}"
+    return hashlib.md5(key_data.encode()).hexdigest()
+
+class _LeaderCancelled(Exception):
+    """The caller running a flight was cancelled; its waiters start a new one"""
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution"""
+    
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.flights = 0
+        self.coalesced = 0
+    
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory once per key at a time; concurrent callers await the same result.
+        
+        Errors propagate to every waiter and nothing is stored, so the next
+        call after a failure starts a fresh attempt. If the caller running
+        the factory is cancelled (e.g. its client disconnected), the waiters
+        are not: the first one to resume takes over with its own factory
+        and the rest wait on it.
+        """
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+        
+        future = asyncio.get_running_loop().create_future()
+        # Mark the outcome as retrieved even when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self.flights += 1
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
 class MemoryCache:
-    """Simple in-memory cache for API responses"""
+    """Bounded in-memory LRU cache for API responses.
+    
+    Entries are capped by count and by approximate size in bytes; the least
+    recently used entries are evicted first. Expired entries are removed on
+    read and by a periodic background sweep. Entries can carry tags for
+    invalidation on writes, and a stale window during which an expired
+    entry may still be served while it is refreshed.
+    """
     
-    def __init__(self, default_ttl: int = 3600):
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        default_ttl: int = 3600,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        sweep_interval: float = 60.0
+    ):
+        self.cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.total_bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self._tag_keys: Dict[str, Set[str]] = defaultdict(set)
+        self._tag_versions: Dict[str, int] = defaultdict(int)
+        self._flight = SingleFlight()
+        
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+        self.invalidations = 0
         
     def _generate_key(self, request: Request) -> str:
         """Generate cache key from request"""
-        key_data = f"{request.method}:{request.url.path}:{request.url.query}"
-        return hashlib.md5(key_data.encode()).hexdigest()
+        return request_cache_key(request)
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get cached value"""
-        if key in self.cache:
-            cache_entry = self.cache[key]
-            if time.time() < cache_entry['expires_at']:
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        """Approximate memory footprint of a cached value in bytes"""
+        if isinstance(value, CachedBody):
+            return value.nbytes
+        if isinstance(value, (bytes, bytearray, str)):
+            return len(value)
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return sys.getsizeof(value)
+    
+    def _remove(self, key: str) -> None:
+        entry = self.cache.pop(key)
+        self.total_bytes -= entry['size']
+        for tag in entry['tags']:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+    
+    def lookup(self, key: str, allow_stale: bool = False) -> Tuple[Optional[Any], bool]:
+        """Get cached value and whether it is stale.
+        
+        Stale values are only returned when allow_stale is set and the entry
+        is still inside its stale-while-revalidate window.
+        """
+        cache_entry = self.cache.get(key)
+        if cache_entry is not None:
+            now = time.time()
+            if now < cache_entry['expires_at']:
+                self.cache.move_to_end(key)
+                self.hits += 1
                 logger.info(f"Cache HIT for key: {key[:8]}...")
-                return cache_entry['data']
+                return cache_entry['data'], False
+            elif now < cache_entry['stale_until']:
+                if allow_stale:
+                    self.cache.move_to_end(key)
+                    self.stale_hits += 1
+                    logger.info(f"Cache STALE for key: {key[:8]}...")
+                    return cache_entry['data'], True
             else:
                 # Cache expired, remove it
-                del self.cache[key]
+                self._remove(key)
+                self.expirations += 1
                 logger.info(f"Cache EXPIRED for key: {key[:8]}...")
         
+        self.misses += 1
         logger.info(f"Cache MISS for key: {key[:8]}...")
-        return None
+        return None, False
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get cached value"""
+        return self.lookup(key)[0]
+    
+    async def single_flight(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory once per key at a time; concurrent callers await the same result"""
+        return await self._flight.run(key, factory)
+    
+    def tags_version(self, tags: Iterable[str]) -> int:
+        """Combined invalidation version of the given tags"""
+        return sum(self._tag_versions[tag] for tag in tags)
+    
+    def invalidate_tags(self, *tags: str) -> int:
+        """Remove every entry carrying any of the tags, returning how many were removed"""
+        removed = 0
+        for tag in tags:
+            self._tag_versions[tag] += 1
+            for key in list(self._tag_keys.get(tag, ())):
+                self._remove(key)
+                removed += 1
+        self.invalidations += removed
+        logger.info(f"Cache INVALIDATED {removed} entries for tags: {', '.join(tags)}")
+        return removed
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """Set cache value"""
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        tags: Iterable[str] = (),
+        stale_ttl: int = 0,
+        version: Optional[int] = None
+    ) -> None:
+        """Set cache value, evicting least recently used entries if over capacity
+        
+        When version is given, the value is dropped if any of its tags were
+        invalidated since that version was read, so a slow fetch cannot
+        repopulate the cache with data older than a write.
+        """
+        tags = tuple(tags)
+        if version is not None and version != self.tags_version(tags):
+            logger.info(f"Cache SKIP for key: {key[:8]}... (invalidated during fetch)")
+            return
+        
         ttl = ttl or self.default_ttl
         expires_at = time.time() + ttl
+        size = self._estimate_size(value)
+        
+        if size > self.max_bytes:
+            logger.warning(f"Cache SKIP for key: {key[:8]}... ({size} bytes exceeds cache size)")
+            return
+        
+        if key in self.cache:
+            self._remove(key)
         
         self.cache[key] = {
             'data': value,
-            'expires_at': expires_at
+            'expires_at': expires_at,
+            'stale_until': expires_at + stale_ttl,
+            'size': size,
+            'tags': tags
         }
+        self.total_bytes += size
+        for tag in tags:
+            self._tag_keys[tag].add(key)
+        
+        while len(self.cache) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest_key = next(iter(self.cache))
+            self._remove(oldest_key)
+            self.evictions += 1
         
         logger.info(f"Cache SET for key: {key[:8]}... (TTL: {ttl}s)")
     
+    def sweep(self) -> int:
+        """Remove all expired entries past their stale window, returning how many were removed"""
+        now = time.time()
+        expired = [key for key, entry in self.cache.items() if entry['stale_until'] <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        return len(expired)
+    
+    async def _sweep_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            removed = self.sweep()
+            if removed:
+                logger.info(f"Cache sweep removed {removed} expired entries")
+    
+    def start_sweeper(self) -> None:
+        """Start the background expiry sweeper"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_periodically())
+    
+    async def stop_sweeper(self) -> None:
+        """Stop the background expiry sweeper"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+    
     def clear(self) -> None:
         """Clear all cache"""
         self.cache.clear()
+        self._tag_keys.clear()
+        self.total_bytes = 0
         logger.info("Cache cleared")
     
     def size(self) -> int:
         """Get cache size"""
         return len(self.cache)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit/miss/eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "entries": len(self.cache),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            **self._flight.stats(),
+        }
+
+def _create_cache():
+    """Build the cache backend selected by CACHE_BACKEND (memory or shared).
+
+    "shared" keeps entries in a tmpfs directory common to every worker
+    process on the host, so one miss fills the cache for all of them.
+    """
+    options = {
+        "default_ttl": 1800,  # 30 minutes default
+        "max_entries": int(os.environ.get("CACHE_MAX_ENTRIES", 1000)),
+        "max_bytes": int(os.environ.get("CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    }
+    backend = os.environ.get("CACHE_BACKEND", "memory")
+    if backend == "shared":
+        from middleware.shared_cache import SharedCache
+        return SharedCache(directory=os.environ.get("CACHE_SHARED_DIR"), **options)
+    if backend != "memory":
+        logger.warning(f"⚠️ Unknown CACHE_BACKEND {backend!r}, using memory")
+    return MemoryCache(**options)
 
 # Global cache instance
-cache = MemoryCache(default_ttl=1800)  # 30 minutes default
+cache = _create_cache()
+
+def _find_request(args, kwargs) -> Optional[Request]:
+    """Find the Request among endpoint arguments (FastAPI passes them as kwargs)"""
+    for arg in (*args, *kwargs.values()):
+        if isinstance(arg, Request):
+            return arg
+    return None
+
+# Keys with a background refresh in flight, and strong references to the
+# refresh tasks so they are not garbage collected mid-run
+_refreshing: Set[str] = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+async def _fetch_and_store(func, args, kwargs, cache_key: str, ttl: int, tags, stale_ttl: int):
+    """Run the endpoint and cache its rendered body; returns the entry or raw result"""
+    version = cache.tags_version(tags)
+    result = await func(*args, **kwargs)
+    
+    # Only cache successful, not already rendered responses
+    if result is None or isinstance(result, Response):
+        return result
+    
+    entry = CachedBody(ORJSONResponse(content=jsonable_encoder(result)).body)
+    cache.set(cache_key, entry, ttl, tags=tags, stale_ttl=stale_ttl, version=version)
+    return entry
 
-def cached_response(ttl: int = 1800):
-    """Decorator for caching API responses"""
+def _schedule_refresh(func, args, kwargs, cache_key: str, ttl: int, tags, stale_ttl: int) -> None:
+    """Refresh a stale entry in the background, at most once per key at a time"""
+    if cache_key in _refreshing:
+        return
+    _refreshing.add(cache_key)
+    
+    async def refresh():
+        try:
+            await cache.single_flight(cache_key, lambda: _fetch_and_store(
+                func, args, kwargs, cache_key, ttl, tags, stale_ttl
+            ))
+        except Exception as e:
+            logger.warning(f"Background refresh failed for key {cache_key[:8]}...: {e}")
+        finally:
+            _refreshing.discard(cache_key)
+    
+    task = asyncio.create_task(refresh())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def cached_response(ttl: int = 1800, tags: Iterable[str] = (), stale_while_revalidate: int = 0):
+    """Decorator for caching API responses as pre-encoded bytes
+    
+    tags lets writes purge the entry via cache.invalidate_tags(). Within
+    stale_while_revalidate seconds after expiry the old entry is still
+    served while a background task refreshes it.
+    """
+    tags = tuple(tags)
+    
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Find request object in args
-            request = None
-            for arg in args:
-                if isinstance(arg, Request):
-                    request = arg
-                    break
+            request = _find_request(args, kwargs)
             
             if not request:
                 # No request found, execute without caching
                 return await func(*args, **kwargs)
             
             cache_key = cache._generate_key(request)
+            accept_encoding = request.headers.get("accept-encoding", "")
             
             # Try to get from cache first
-            cached_result = cache.get(cache_key)
+            cached_result, stale = cache.lookup(cache_key, allow_stale=stale_while_revalidate > 0)
             if cached_result is not None:
-                return cached_result
-            
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            
-            # Only cache successful responses
-            if result is not None:
-                cache.set(cache_key, result, ttl)
+                if stale:
+                    _schedule_refresh(func, args, kwargs, cache_key, ttl, tags, stale_while_revalidate)
+                return cached_result.response(accept_encoding)
             
+            # Execute function and cache result; concurrent misses for the
+            # same key share one execution
+            result = await cache.single_flight(cache_key, lambda: _fetch_and_store(
+                func, args, kwargs, cache_key, ttl, tags, stale_while_revalidate
+            ))
+            if isinstance(result, CachedBody):
+                return result.response(accept_encoding)
             return result
         
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
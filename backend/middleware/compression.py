@@ -0,0 +1,19 @@
+from typing import Iterable
+from starlette.middleware.gzip import GZipMiddleware
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves event streams uncompressed
+
+    The gzip stream is only flushed when the compressor's buffer fills, so
+    compressed Server-Sent Events would reach the client late and in bursts.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, excluded_paths: Iterable[str] = ()):
+        super().__init__(app, minimum_size=minimum_size)
+        self.excluded_paths = tuple(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
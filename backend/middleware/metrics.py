@@ -0,0 +1,121 @@
+from typing import Any, Callable, Dict
+import time
+from config.logging_setup import logging_stats
+from config.metrics import metrics, http_requests, http_request_duration, http_in_flight
+from config.monitoring import pool_metrics
+from middleware.cache import cache
+from middleware.rate_limiting import RATE_LIMIT_POLICIES, rate_limit_store
+from services.analytics_buffer import analytics_buffer
+from services.session_tracker import session_tracker
+from services.live_feed import live_feed
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request counts, latency and in-flight requests
+
+    Requests are labeled with the matched route template (e.g.
+    /api/contact/messages/{message_id}/read) rather than the raw path, so
+    label cardinality stays bounded. Requests rejected before routing, such
+    as rate-limited ones, are labeled "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status = 500
+        http_in_flight.inc()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec()
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"), str(status))
+            http_requests.inc(labels)
+            http_request_duration.observe(time.perf_counter() - start_time, labels)
+
+def _stats_metric(name: str, help: str, kind: str, stats: Callable[[], Dict[str, Any]], key: str) -> None:
+    """Expose one numeric field of a component's stats() dict"""
+    metrics.collector(name, help, kind, lambda: [({}, stats()[key])])
+
+# Response cache
+for _key, _kind, _help in (
+    ("hits", "counter", "Response cache hits"),
+    ("stale_hits", "counter", "Stale entries served while revalidating"),
+    ("misses", "counter", "Response cache misses"),
+    ("evictions", "counter", "Entries evicted for capacity"),
+    ("expirations", "counter", "Entries removed after expiry"),
+    ("invalidations", "counter", "Tag invalidations"),
+    ("coalesced", "counter", "Misses coalesced onto an in-flight fetch"),
+    ("entries", "gauge", "Entries in the response cache"),
+    ("bytes", "gauge", "Bytes held by the response cache"),
+):
+    _stats_metric(f"cache_{_key}{'_total' if _kind == 'counter' else ''}", _help, _kind, cache.stats, _key)
+
+# Rate limiting
+metrics.collector(
+    "rate_limit_requests_total", "Rate limit decisions by policy and result", "counter",
+    lambda: [
+        ({"policy": policy, "result": result}, limiter.stats()[result])
+        for policy, limiter in RATE_LIMIT_POLICIES.items()
+        for result in ("allowed", "rejected")
+    ]
+)
+_stats_metric("rate_limit_clients", "Clients with live rate limit state", "gauge", rate_limit_store.stats, "clients")
+
+# Mongo connection pool
+for _key, _kind, _help in (
+    ("in_use", "gauge", "Pooled connections checked out"),
+    ("open_connections", "gauge", "Open pooled connections"),
+    ("checkouts", "counter", "Connection checkouts"),
+    ("checkout_failures", "counter", "Failed connection checkouts"),
+    ("pools_cleared", "counter", "Times the pool was cleared"),
+):
+    _stats_metric(
+        f"mongo_pool_{_key}{'_total' if _kind == 'counter' else ''}", _help, _kind, pool_metrics.snapshot, _key
+    )
+metrics.collector(
+    "mongo_pool_checkout_wait_seconds", "Connection checkout wait (avg and max)", "gauge",
+    lambda: [
+        ({"stat": stat}, value / 1000)
+        for stat, value in pool_metrics.snapshot()["checkout_wait_ms"].items()
+    ]
+)
+
+# Analytics write buffer
+for _key, _kind, _help in (
+    ("queue_depth", "gauge", "Analytics events waiting to be written"),
+    ("enqueued", "counter", "Analytics events accepted"),
+    ("dropped", "counter", "Analytics events shed because the buffer was full"),
+    ("written", "counter", "Analytics events written to Mongo"),
+    ("failed", "counter", "Analytics events that failed to write"),
+    ("retried", "counter", "Analytics buffer writes retried after a transient error"),
+    ("flushes", "counter", "Analytics buffer flushes"),
+):
+    _stats_metric(
+        f"analytics_buffer_{_key}{'_total' if _kind == 'counter' else ''}", _help, _kind, analytics_buffer.metrics, _key
+    )
+
+# Streaming session tracker
+_stats_metric("session_tracker_open_sessions", "Sessions held in memory by the streaming tracker", "gauge", session_tracker.stats, "open_sessions")
+_stats_metric("session_tracker_flushed_total", "Session upserts written by the streaming tracker", "counter", session_tracker.stats, "flushed")
+
+# Live analytics feed
+_stats_metric("live_feed_subscribers", "Connected live dashboard streams", "gauge", live_feed.stats, "subscribers")
+_stats_metric("live_feed_rejected_total", "Live streams refused at the subscriber limit", "counter", live_feed.stats, "rejected")
+
+# Logging queue
+_stats_metric("log_queue_depth", "Log records waiting for the writer thread", "gauge", logging_stats, "queued")
+_stats_metric("log_records_dropped_total", "Log records dropped because the queue was full", "counter", logging_stats, "dropped")
@@ -1,82 +1,350 @@
-from fastapi import HTTPException, Request
-from functools import wraps
+from fastapi import Request
+import fcntl
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
 import time
-from typing import Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
+def client_id_from_headers(forwarded_for: Optional[str], real_ip: Optional[str], peer: Optional[str]) -> str:
+    """Client identifier: first X-Forwarded-For hop, X-Real-IP, then the peer address"""
+    # Try to get real IP from headers (for production behind proxy)
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+    if real_ip:
+        return real_ip
+    return peer or "unknown"
+
+class MemoryRateLimitStore:
+    """Per-process GCRA state: one theoretical arrival time (TAT) per key
+
+    Keys are kept least recently seen first, using the insertion order of
+    a plain dict (a key is re-inserted on every request). A key whose TAT
+    has passed is indistinguishable from a new one, so idle keys are
+    evicted from the front every evict_every updates, or whenever
+    max_clients is exceeded.
+    """
+    
+    def __init__(self, max_clients: int = 100_000, evict_every: int = 1000):
+        self.max_clients = max_clients
+        self.evict_every = evict_every
+        self.clients: Dict[str, float] = {}
+        self._updates = 0
+        self.evicted = 0
+    
+    def gcra(self, key: str, now: float, emission_interval: float, tolerance: float) -> Tuple[bool, float]:
+        """Apply GCRA to one request; returns (allowed, seconds until retry)"""
+        clients = self.clients
+        # Popping and re-inserting moves the key to the most recent end
+        tat = clients.pop(key, now)
+        if tat < now:
+            tat = now
+        allow_at = tat - tolerance
+        if now < allow_at:
+            clients[key] = tat
+            return False, allow_at - now
+        
+        clients[key] = tat + emission_interval
+        
+        self._updates += 1
+        if self._updates >= self.evict_every or len(clients) > self.max_clients:
+            self._updates = 0
+            self.evict_idle(now)
+        return True, 0.0
+    
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop idle keys from the least recent end, then the oldest over max_clients"""
+        if now is None:
+            now = time.monotonic()
+        
+        clients = self.clients
+        excess = len(clients) - self.max_clients
+        evict = []
+        for key, tat in clients.items():
+            # A TAT in the past carries no state; over capacity, forgetting
+            # a throttled client only resets its budget
+            if tat > now and len(evict) >= excess:
+                break
+            evict.append(key)
+        for key in evict:
+            del clients[key]
+        
+        self.evicted += len(evict)
+        return len(evict)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "clients": len(self.clients),
+            "max_clients": self.max_clients,
+            "evicted": self.evicted,
+        }
+
+# Shared store slot: 64-bit key hash (0 = never used) and TAT
+_SLOT = struct.Struct("Qd")
+
+class SharedRateLimitStore:
+    """GCRA state shared by every worker process on the host
+
+    A fixed-size open-addressing hash table in a memory-mapped tmpfs file,
+    updated under an exclusive flock. Slots whose TAT has passed are free
+    to reuse, so idle clients need no separate eviction; when a probe
+    window has no free slot, the slot closest to expiry is taken over.
+    Timestamps use the monotonic clock, which Linux shares between
+    processes.
+    """
+    
+    def __init__(self, path: Optional[str] = None, slots: int = 65536, max_probe: int = 16):
+        if path is None:
+            base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            path = os.path.join(base, "portfolio-ratelimit.bin")
+        self.path = path
+        self.slots = slots
+        self.max_probe = max_probe
+        self.evicted = 0
+        
+        size = slots * _SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+    
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Python's hash() is salted per process, so use a stable digest
+        h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        return h or 1
+    
+    def gcra(self, key: str, now: float, emission_interval: float, tolerance: float) -> Tuple[bool, float]:
+        """Apply GCRA to one request; returns (allowed, seconds until retry)"""
+        h = self._hash(key)
+        base = h % self.slots
+        table = self._map
+        
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            slot = free = oldest = None
+            oldest_tat = 0.0
+            for probe in range(self.max_probe):
+                index = (base + probe) % self.slots
+                slot_hash, slot_tat = _SLOT.unpack_from(table, index * _SLOT.size)
+                if slot_hash == h:
+                    slot = index
+                    break
+                if slot_hash == 0:
+                    # End of the probe chain: the key is not stored
+                    if free is None:
+                        free = index
+                    break
+                if slot_tat <= now:
+                    if free is None:
+                        free = index
+                elif oldest is None or slot_tat < oldest_tat:
+                    oldest, oldest_tat = index, slot_tat
+            
+            if slot is not None:
+                tat = max(_SLOT.unpack_from(table, slot * _SLOT.size)[1], now)
+            else:
+                tat = now
+                if free is not None:
+                    slot = free
+                else:
+                    slot = oldest
+                    self.evicted += 1
+            
+            allow_at = tat - tolerance
+            if now < allow_at:
+                return False, allow_at - now
+            
+            _SLOT.pack_into(table, slot * _SLOT.size, h, tat + emission_interval)
+            return True, 0.0
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+    
+    def stats(self) -> Dict[str, Any]:
+        table = np.frombuffer(self._map, dtype=[("hash", "<u8"), ("tat", "<f8")])
+        return {
+            "backend": "shared",
+            "clients": int(np.count_nonzero(table["tat"] > time.monotonic())),
+            "slots": self.slots,
+            "evicted": self.evicted,
+        }
+
+def _create_store():
+    """Build the limiter store selected by RATE_LIMIT_BACKEND (memory or shared)"""
+    backend = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+    if backend == "shared":
+        return SharedRateLimitStore(
+            path=os.environ.get("RATE_LIMIT_SHARED_PATH"),
+            slots=int(os.environ.get("RATE_LIMIT_SHARED_SLOTS", 65536))
+        )
+    if backend != "memory":
+        logger.warning(f"⚠️ Unknown RATE_LIMIT_BACKEND {backend!r}, using memory")
+    return MemoryRateLimitStore()
+
 class RateLimiter:
-    """Simple in-memory rate limiter"""
+    """GCRA (generic cell rate algorithm) rate limiter
+
+    Allows up to `burst` requests back to back, refilling at
+    requests_per_minute. State lives in the store, keyed by the limiter's
+    name and the client, so several limiters can share one store.
+    """
     
-    def __init__(self, requests_per_minute: int = 60):
+    def __init__(
+        self,
+        requests_per_minute: int = 60,
+        burst: Optional[int] = None,
+        store=None,
+        name: str = "default"
+    ):
         self.requests_per_minute = requests_per_minute
-        self.requests: Dict[str, list] = {}
+        self.burst = burst or requests_per_minute
+        self.store = store if store is not None else MemoryRateLimitStore()
+        self.name = name
+        
+        # Seconds between requests at the sustained rate, and how far ahead
+        # of real time a client's TAT may run before it is throttled
+        self.emission_interval = 60.0 / requests_per_minute
+        self.tolerance = self.emission_interval * (self.burst - 1)
+        
+        # Counters
+        self.allowed = 0
+        self.rejected = 0
     
     def _get_client_id(self, request: Request) -> str:
         """Get client identifier"""
-        # Try to get real IP from headers (for production behind proxy)
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
+        return client_id_from_headers(
+            request.headers.get("X-Forwarded-For"),
+            request.headers.get("X-Real-IP"),
+            request.client.host if request.client else None
+        )
+    
+    def check(self, client_id: str, now: Optional[float] = None) -> Tuple[bool, int]:
+        """Check one request from a client; returns (allowed, seconds until retry)"""
+        if now is None:
+            now = time.monotonic()
         
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
+        allowed, retry_after = self.store.gcra(
+            f"{self.name}:{client_id}", now, self.emission_interval, self.tolerance
+        )
+        if not allowed:
+            self.rejected += 1
+            logger.warning(f"Rate limit exceeded for {client_id} ({self.name})")
+            return False, max(1, math.ceil(retry_after))
         
-        return request.client.host if request.client else "unknown"
+        self.allowed += 1
+        return True, 0
     
     def is_allowed(self, request: Request) -> Tuple[bool, int]:
         """Check if request is allowed"""
-        client_id = self._get_client_id(request)
-        current_time = time.time()
+        return self.check(self._get_client_id(request))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Limiter configuration and counters"""
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "burst": self.burst,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+# Global rate limit store and limiter instances
+rate_limit_store = _create_store()
+general_limiter = RateLimiter(requests_per_minute=100, store=rate_limit_store, name="general")  # General API
+contact_limiter = RateLimiter(requests_per_minute=5, store=rate_limit_store, name="contact")    # Contact form
+
+# Analytics ingest allows bursts (page load, tab close) on top of the sustained rate
+RATE_LIMIT_POLICIES: Dict[str, RateLimiter] = {
+    "general": general_limiter,
+    "contact": contact_limiter,
+    "ingest": RateLimiter(requests_per_minute=120, burst=60, store=rate_limit_store, name="ingest"),
+    "ingest_batch": RateLimiter(requests_per_minute=30, burst=10, store=rate_limit_store, name="ingest_batch"),
+}
+
+# Route policy table: (method or "*", path, policy or None for no limit).
+# A trailing "*" makes the path a prefix; the first matching entry wins.
+RATE_LIMIT_ROUTES: List[Tuple[str, str, Optional[str]]] = [
+    ("POST", "/api/contact", "contact"),
+    ("POST", "/api/analytics/pageview", "ingest"),
+    ("POST", "/api/analytics/interaction", "ingest"),
+    ("POST", "/api/analytics/batch", "ingest_batch"),
+    ("GET", "/api/health*", None),  # Load balancer probes
+    ("*", "/api/*", "general"),
+]
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware applying the route policy table
+
+    Runs before routing, so rejected requests never reach body parsing,
+    dependencies or the response cache.
+    """
+    
+    def __init__(
+        self,
+        app,
+        routes: Optional[List[Tuple[str, str, Optional[str]]]] = None,
+        policies: Optional[Dict[str, RateLimiter]] = None
+    ):
+        self.app = app
+        self.routes = routes if routes is not None else RATE_LIMIT_ROUTES
+        self.policies = policies if policies is not None else RATE_LIMIT_POLICIES
+        self._rejection_body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+    
+    def _policy(self, method: str, path: str) -> Optional[RateLimiter]:
+        for route_method, route_path, policy in self.routes:
+            if route_method != "*" and route_method != method:
+                continue
+            if route_path.endswith("*"):
+                matched = path.startswith(route_path[:-1])
+            else:
+                matched = path == route_path or path == route_path + "/"
+            if matched:
+                return self.policies[policy] if policy else None
+        return None
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
         
-        # Clean old requests (older than 1 minute)
-        if client_id in self.requests:
-            self.requests[client_id] = [
-                req_time for req_time in self.requests[client_id]
-                if current_time - req_time < 60
-            ]
-        else:
-            self.requests[client_id] = []
+        limiter = self._policy(scope["method"], scope["path"])
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
         
-        # Check if limit exceeded
-        if len(self.requests[client_id]) >= self.requests_per_minute:
-            oldest_request = min(self.requests[client_id])
-            reset_time = int(oldest_request + 60 - current_time)
-            logger.warning(f"Rate limit exceeded for {client_id}")
-            return False, reset_time
+        forwarded_for = real_ip = None
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                forwarded_for = value.decode("latin-1")
+            elif name == b"x-real-ip":
+                real_ip = value.decode("latin-1")
+        client = scope.get("client")
+        client_id = client_id_from_headers(forwarded_for, real_ip, client[0] if client else None)
         
-        # Add current request
-        self.requests[client_id].append(current_time)
-        return True, 0
-
-# Global rate limiter instances
-general_limiter = RateLimiter(requests_per_minute=100)  # General API
-contact_limiter = RateLimiter(requests_per_minute=5)    # Contact form
-
-def rate_limit(limiter: RateLimiter = general_limiter):
-    """Rate limiting decorator"""
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            # Find request object in args
-            request = None
-            for arg in args:
-                if isinstance(arg, Request):
-                    request = arg
-                    break
-            
-            if request:
-                allowed, reset_time = limiter.is_allowed(request)
-                if not allowed:
-                    raise HTTPException(
-                        status_code=429,
-                        detail="Rate limit exceeded",
-                        headers={"Retry-After": str(reset_time)}
-                    )
-            
-            return await func(*args, **kwargs)
+        allowed, retry_after = limiter.check(client_id)
+        if allowed:
+            await self.app(scope, receive, send)
+            return
         
-        return wrapper
-    return decorator
\ No newline at end of file
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(self._rejection_body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": self._rejection_body})
@@ -6,42 +6,58 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Add security headers and request logging"""
+# Sent on every response; encoded once at import
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+    (b"x-robots-tag", b"index, follow"),
+]
+
+class SecurityMiddleware:
+    """Add security headers and request logging
+    
+    Pure ASGI: headers are appended to the http.response.start message and
+    body messages pass through untouched, so streaming responses are not
+    buffered. Headers the response already sets are left as they are.
+    X-Process-Time is the time to the start of the response.
+    """
     
     def __init__(self, app, enable_logging: bool = True):
-        super().__init__(app)
+        self.app = app
         self.enable_logging = enable_logging
     
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Log request if enabled
-        if self.enable_logging:
-            logger.info(f"Request: {request.method} {request.url.path}")
-        
-        response = await call_next(request)
-        
-        # Add security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        response.headers["X-Robots-Tag"] = "index, follow"
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Add performance headers
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(round(process_time * 1000, 2))
+        start_time = time.perf_counter()
         
-        # Log response if enabled
-        if self.enable_logging:
-            logger.info(
-                f"Response: {response.status_code} "
-                f"({round(process_time * 1000, 2)}ms)"
-            )
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                process_ms = round((time.perf_counter() - start_time) * 1000, 2)
+                headers = list(message.get("headers", ()))
+                present = {name.lower() for name, _ in headers}
+                headers.extend(header for header in SECURITY_HEADERS if header[0] not in present)
+                headers.append((b"x-process-time", str(process_ms).encode()))
+                message["headers"] = headers
+                if self.enable_logging and logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        "%s %s -> %s (%sms)",
+                        scope["method"], scope["path"], message["status"], process_ms,
+                        extra={
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "status": message["status"],
+                            "duration_ms": process_ms,
+                        }
+                    )
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_with_headers)
 
 class CompressionMiddleware(BaseHTTPMiddleware):
     """Simple compression middleware"""
@@ -0,0 +1,433 @@
+from fastapi import Request
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+import asyncio
+import fcntl
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+import logging
+from middleware.cache import CachedBody, SingleFlight, request_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Invalidation counters live in a small memory-mapped array shared by all
+# workers. Tags hash onto slots; slot 0 is a global counter bumped by clear().
+_VERSION_SLOTS = 256
+_SLOT = struct.Struct("Q")
+_HEADER_LENGTH = struct.Struct("!I")
+
+def _default_directory() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "portfolio-cache")
+
+class SharedCache:
+    """Response cache shared by all worker processes on one host.
+
+    Each entry is a file in a tmpfs directory (/dev/shm when available),
+    written atomically with a rename. Entries record the invalidation
+    version of their tags; bumping a tag's counter in the shared mmap
+    invalidates matching entries in every worker at once. Misses are
+    coalesced within a worker and, through a per-key file lock, across
+    workers, so one Mongo read refills a key for the whole host.
+
+    Only CachedBody values are supported. It exposes the same interface
+    as MemoryCache so cached_response works with either.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        default_ttl: int = 3600,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        sweep_interval: float = 60.0,
+        lock_timeout: float = 5.0,
+        usage_ttl: float = 1.0
+    ):
+        self.directory = directory or _default_directory()
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.lock_timeout = lock_timeout
+        self.usage_ttl = usage_ttl
+        self._sweeper: Optional[asyncio.Task] = None
+        self._flight = SingleFlight()
+
+        # Decoded entries keyed by cache key, reused while the file is unchanged
+        self._local: Dict[str, Tuple[Tuple[int, int], Dict[str, Any], CachedBody]] = {}
+
+        # Host-wide (entries, bytes) and when it was measured; a metrics
+        # scrape reads stats() once per metric, so the directory scan is reused
+        self._usage: Optional[Tuple[int, int]] = None
+        self._usage_at = 0.0
+
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._versions_fd = os.open(os.path.join(self.directory, "versions.bin"), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._versions_fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._versions_fd).st_size < _VERSION_SLOTS * _SLOT.size:
+                os.ftruncate(self._versions_fd, _VERSION_SLOTS * _SLOT.size)
+        finally:
+            fcntl.flock(self._versions_fd, fcntl.LOCK_UN)
+        self._versions = mmap.mmap(self._versions_fd, _VERSION_SLOTS * _SLOT.size)
+
+        # Counters (per worker)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.remote_fills = 0
+
+    def _generate_key(self, request: Request) -> str:
+        """Generate cache key from request"""
+        return request_cache_key(request)
+
+    def _path(self, key: str, suffix: str = ".entry") -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    @staticmethod
+    def _slot(tag: str) -> int:
+        return 1 + zlib.crc32(tag.encode()) % (_VERSION_SLOTS - 1)
+
+    def _read_slot(self, slot: int) -> int:
+        return _SLOT.unpack_from(self._versions, slot * _SLOT.size)[0]
+
+    def _bump_slot(self, slot: int) -> None:
+        fcntl.flock(self._versions_fd, fcntl.LOCK_EX)
+        try:
+            _SLOT.pack_into(self._versions, slot * _SLOT.size, self._read_slot(slot) + 1)
+        finally:
+            fcntl.flock(self._versions_fd, fcntl.LOCK_UN)
+
+    def tags_version(self, tags: Iterable[str]) -> int:
+        """Combined invalidation version of the given tags (plus the global counter)"""
+        return self._read_slot(0) + sum(self._read_slot(self._slot(tag)) for tag in tags)
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Invalidate every entry carrying any of the tags, in all workers.
+
+        Bumping the counters is what invalidates; the entry files that no
+        longer match are then purged, returning how many were removed.
+        """
+        for tag in tags:
+            self._bump_slot(self._slot(tag))
+        removed = 0
+        for dir_entry in self._entries():
+            key = dir_entry.name[:-len(".entry")]
+            loaded = self._load(key)
+            if loaded is not None and loaded[0]["version"] != self.tags_version(loaded[0]["tags"]):
+                self._unlink(key)
+                removed += 1
+        self._usage = None
+        self.invalidations += removed
+        logger.info(f"Cache INVALIDATED {removed} entries for tags: {', '.join(tags)}")
+        return removed
+
+    def _load(self, key: str) -> Optional[Tuple[Dict[str, Any], CachedBody]]:
+        """Read an entry file, reusing the decoded copy if the file is unchanged"""
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._local.pop(key, None)
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_ino)
+        local = self._local.get(key)
+        if local is not None and local[0] == signature:
+            return local[1], local[2]
+
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            (header_length,) = _HEADER_LENGTH.unpack_from(data)
+            offset = _HEADER_LENGTH.size + header_length
+            header = json.loads(data[_HEADER_LENGTH.size:offset])
+
+            parts = []
+            for length in header["lengths"]:
+                parts.append(data[offset:offset + length] if length else None)
+                offset += length
+            if offset != len(data):
+                raise ValueError("entry length does not match its header")
+        except (ValueError, KeyError, TypeError, struct.error) as e:
+            # Truncated or corrupt (e.g. shm filled up mid-write): a miss
+            logger.warning(f"⚠️ Discarding corrupt cache entry {key[:8]}...: {e}")
+            self._unlink(key)
+            return None
+
+        entry = CachedBody.__new__(CachedBody)
+        entry.body, entry.gzip, entry.br = parts[0] or b"", parts[1], parts[2]
+        entry.media_type = header["media_type"]
+
+        if len(self._local) >= self.max_entries:
+            self._local.pop(next(iter(self._local)))
+        self._local[key] = (signature, header, entry)
+        return header, entry
+
+    def _unlink(self, key: str) -> None:
+        self._local.pop(key, None)
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def lookup(self, key: str, allow_stale: bool = False) -> Tuple[Optional[Any], bool]:
+        """Get cached value and whether it is stale"""
+        loaded = self._load(key)
+        if loaded is not None:
+            header, entry = loaded
+            now = time.time()
+            if header["version"] != self.tags_version(header["tags"]):
+                self._unlink(key)
+            elif now < header["expires_at"]:
+                self.hits += 1
+                logger.info(f"Cache HIT for key: {key[:8]}...")
+                return entry, False
+            elif now < header["stale_until"]:
+                if allow_stale:
+                    self.stale_hits += 1
+                    logger.info(f"Cache STALE for key: {key[:8]}...")
+                    return entry, True
+            else:
+                self._unlink(key)
+                self.expirations += 1
+                logger.info(f"Cache EXPIRED for key: {key[:8]}...")
+
+        self.misses += 1
+        logger.info(f"Cache MISS for key: {key[:8]}...")
+        return None, False
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get cached value"""
+        return self.lookup(key)[0]
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        tags: Iterable[str] = (),
+        stale_ttl: int = 0,
+        version: Optional[int] = None
+    ) -> None:
+        """Write an entry file atomically so other workers never see a partial entry"""
+        if not isinstance(value, CachedBody):
+            raise TypeError("SharedCache only stores CachedBody values")
+
+        tags = tuple(tags)
+        current_version = self.tags_version(tags)
+        if version is not None and version != current_version:
+            logger.info(f"Cache SKIP for key: {key[:8]}... (invalidated during fetch)")
+            return
+        if value.nbytes > self.max_bytes:
+            logger.warning(f"Cache SKIP for key: {key[:8]}... ({value.nbytes} bytes exceeds cache size)")
+            return
+
+        ttl = ttl or self.default_ttl
+        expires_at = time.time() + ttl
+        parts = (value.body, value.gzip or b"", value.br or b"")
+        header = json.dumps({
+            "expires_at": expires_at,
+            "stale_until": expires_at + stale_ttl,
+            "tags": tags,
+            "version": current_version,
+            "media_type": value.media_type,
+            "lengths": [len(part) for part in parts],
+        }).encode()
+
+        # Keep within the budget on write, not just at the next sweep, so
+        # the cache cannot fill shm between sweeps
+        nbytes = _HEADER_LENGTH.size + len(header) + sum(len(part) for part in parts)
+        entries, total_bytes = self.usage()
+        if entries + 1 > self.max_entries or total_bytes + nbytes > self.max_bytes:
+            self.sweep(reserve_entries=1, reserve_bytes=nbytes)
+
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER_LENGTH.pack(len(header)))
+                f.write(header)
+                for part in parts:
+                    f.write(part)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            # e.g. ENOSPC on a full /dev/shm; the response is still good
+            logger.warning(f"⚠️ Cache write failed for key: {key[:8]}...: {e}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except FileNotFoundError:
+                    pass
+            return
+
+        entries, total_bytes = self.usage()
+        self._usage = (entries + 1, total_bytes + nbytes)
+        logger.info(f"Cache SET for key: {key[:8]}... (TTL: {ttl}s)")
+
+    async def _fill_locked(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Hold the per-key file lock while filling, so only one worker fetches"""
+        fd = os.open(self._path(key, ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        locked = False
+        waited = False
+        deadline = time.monotonic() + self.lock_timeout
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        # Fall back to fetching without the lock
+                        break
+                    waited = True
+                    await asyncio.sleep(0.01)
+
+            if waited:
+                # Another worker held the lock; it has probably filled the key
+                entry, stale = self.lookup(key)
+                if entry is not None and not stale:
+                    self.remote_fills += 1
+                    return entry
+
+            return await factory()
+        finally:
+            if locked:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    async def single_flight(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Coalesce misses within this worker and across workers on the host"""
+        return await self._flight.run(key, lambda: self._fill_locked(key, factory))
+
+    def _entries(self):
+        with os.scandir(self.directory) as entries:
+            return [entry for entry in entries if entry.name.endswith(".entry")]
+
+    def sweep(self, reserve_entries: int = 0, reserve_bytes: int = 0) -> int:
+        """Remove expired or invalidated entries, then the oldest ones while over capacity.
+
+        The reserve leaves room for an entry about to be written.
+        """
+        now = time.time()
+        removed = 0
+        remaining = []
+        for dir_entry in self._entries():
+            key = dir_entry.name[:-len(".entry")]
+            loaded = self._load(key)
+            if loaded is None:
+                removed += 1
+                continue
+            header, entry = loaded
+            if now >= header["stale_until"] or header["version"] != self.tags_version(header["tags"]):
+                self._unlink(key)
+                self.expirations += 1
+                removed += 1
+            else:
+                stat = dir_entry.stat()
+                remaining.append((stat.st_mtime, key, stat.st_size))
+
+        # Lock files of keys without an entry; a race here at worst lets
+        # two workers fetch the same key once
+        with os.scandir(self.directory) as lock_files:
+            for lock_file in lock_files:
+                if lock_file.name.endswith(".lock") and not os.path.exists(self._path(lock_file.name[:-len(".lock")])):
+                    try:
+                        os.unlink(lock_file.path)
+                    except FileNotFoundError:
+                        pass
+
+        remaining.sort()
+        total_bytes = sum(size for _, _, size in remaining)
+        while remaining and (
+            len(remaining) + reserve_entries > self.max_entries
+            or total_bytes + reserve_bytes > self.max_bytes
+        ):
+            _, key, size = remaining.pop(0)
+            self._unlink(key)
+            total_bytes -= size
+            self.evictions += 1
+            removed += 1
+
+        self._usage = (len(remaining), total_bytes)
+        self._usage_at = time.monotonic()
+        return removed
+
+    async def _sweep_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            removed = self.sweep()
+            if removed:
+                logger.info(f"Cache sweep removed {removed} entries")
+
+    def start_sweeper(self) -> None:
+        """Start the background expiry sweeper"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def stop_sweeper(self) -> None:
+        """Stop the background expiry sweeper"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def clear(self) -> None:
+        """Invalidate every entry in all workers"""
+        self._bump_slot(0)
+        self._local.clear()
+        logger.info("Cache cleared")
+
+    def size(self) -> int:
+        """Get cache size"""
+        return len(self._entries())
+
+    def usage(self) -> Tuple[int, int]:
+        """Host-wide (entries, bytes), rescanned at most once per usage_ttl"""
+        if self._usage is None or time.monotonic() - self._usage_at >= self.usage_ttl:
+            sizes = []
+            for entry in self._entries():
+                try:
+                    sizes.append(entry.stat().st_size)
+                except FileNotFoundError:
+                    pass
+            self._usage = (len(sizes), sum(sizes))
+            self._usage_at = time.monotonic()
+        return self._usage
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size (host-wide) and hit/miss counters (this worker)"""
+        entries, size = self.usage()
+        lookups = self.hits + self.misses
+        return {
+            "backend": "shared",
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "remote_fills": self.remote_fills,
+            **self._flight.stats(),
+        }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union, Literal, Annotated
 from datetime import datetime
 import uuid
 
@@ -43,6 +43,7 @@ class AnalyticsSummary(BaseModel):
     bounce_rate: float
     contact_form_submissions: int
     date_range: Dict[str, datetime]
+    unique_visitors_mode: str = "exact"  # 'exact' or 'approximate' (HyperLogLog)
 
 class PageViewCreate(BaseModel):
     page: str
@@ -55,4 +56,19 @@ class UserInteractionCreate(BaseModel):
     element: Optional[str] = None
     page: str
     session_id: Optional[str] = None
-    data: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    data: Optional[Dict[str, Any]] = None
+
+class PageViewEvent(PageViewCreate):
+    type: Literal["pageview"]
+    # Milliseconds between the event and the batch being sent
+    age_ms: Optional[int] = None
+
+class UserInteractionEvent(UserInteractionCreate):
+    type: Literal["interaction"]
+    age_ms: Optional[int] = None
+
+class AnalyticsBatchCreate(BaseModel):
+    events: List[Annotated[
+        Union[PageViewEvent, UserInteractionEvent],
+        Field(discriminator="type")
+    ]] = Field(..., min_length=1, max_length=500)
@@ -1,162 +1,308 @@
-from fastapi import APIRouter, HTTPException, Request
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
 from models.analytics import (
     PageView, UserInteraction, AnalyticsSession, AnalyticsSummary,
-    PageViewCreate, UserInteractionCreate
+    PageViewCreate, UserInteractionCreate, AnalyticsBatchCreate
 )
+from services.analytics_buffer import analytics_buffer
+from services.rollups import rollup_manager
+from services.visitor_sketches import visitor_sketches
+from services.sessionization import session_manager
+from services.dashboard_snapshots import dashboard_snapshots
+from services.live_feed import live_feed, sse_event
+from config.database import get_db
+from routes.pagination import paginate
+from services.analytics_export import EXPORT_COLLECTIONS, require_pyarrow, stream_export
+from fastapi.responses import Response, StreamingResponse
 import os
-from datetime import datetime, timedelta
-from typing import Optional
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import List, Optional
 from collections import defaultdict
 import json
 
 router = APIRouter()
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# List endpoints return stored events as read, projected to their model's
+# fields, instead of re-validating documents we wrote ourselves
+PAGE_VIEW_PROJECTION = {"_id": 0, **{field: 1 for field in PageView.model_fields}}
+INTERACTION_PROJECTION = {"_id": 0, **{field: 1 for field in UserInteraction.model_fields}}
 
-@router.post("/analytics/pageview")
+EXPORT_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# 'approximate' merges HyperLogLog sketches, 'exact' scans raw page views
+UNIQUE_VISITORS_MODE = os.environ.get("ANALYTICS_UNIQUE_MODE", "approximate")
+
+def _get_client_ip(request: Request) -> Optional[str]:
+    """Get client IP, preferring the proxy-forwarded address"""
+    if 'x-forwarded-for' in request.headers:
+        return request.headers['x-forwarded-for'].split(',')[0].strip()
+    return request.client.host if request.client else None
+
+# Oldest client-reported event age accepted in a batch; anything older (or
+# negative) is clamped so a bad client clock cannot move events far
+MAX_EVENT_AGE = timedelta(minutes=10)
+
+def _event_timestamp(received_at: datetime, age_ms: Optional[int]) -> datetime:
+    """When a batched event happened: receipt time minus its clamped age"""
+    if not age_ms or age_ms < 0:
+        return received_at
+    return received_at - min(timedelta(milliseconds=age_ms), MAX_EVENT_AGE)
+
+def _buffer_full() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Analytics buffer full",
+        headers={"Retry-After": "1"}
+    )
+
+@router.post("/analytics/pageview", status_code=202)
 async def track_page_view(request: Request, page_view_data: PageViewCreate):
     """Track a page view"""
     try:
-        # Get client IP
-        client_ip = request.client.host
-        if 'x-forwarded-for' in request.headers:
-            client_ip = request.headers['x-forwarded-for'].split(',')[0].strip()
-        
         page_view = PageView(
             **page_view_data.dict(),
-            ip_address=client_ip
+            ip_address=_get_client_ip(request)
         )
         
-        page_view_dict = page_view.dict()
-        result = await db.page_views.insert_one(page_view_dict)
+        # Written in the background by the analytics write buffer
+        if not await analytics_buffer.put("page_views", page_view.dict()):
+            raise _buffer_full()
+        live_feed.page_view(page_view.page)
         
-        if not result.inserted_id:
-            raise HTTPException(status_code=400, detail="Failed to track page view")
-        
-        return {"message": "Page view tracked successfully", "id": page_view.id}
+        return {"message": "Page view accepted", "id": page_view.id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/analytics/interaction")
+@router.post("/analytics/interaction", status_code=202)
 async def track_user_interaction(request: Request, interaction_data: UserInteractionCreate):
     """Track a user interaction"""
     try:
         interaction = UserInteraction(**interaction_data.dict())
-        interaction_dict = interaction.dict()
-        
-        result = await db.user_interactions.insert_one(interaction_dict)
         
-        if not result.inserted_id:
-            raise HTTPException(status_code=400, detail="Failed to track interaction")
+        if not await analytics_buffer.put("user_interactions", interaction.dict()):
+            raise _buffer_full()
+        live_feed.interaction()
         
-        return {"message": "Interaction tracked successfully", "id": interaction.id}
+        return {"message": "Interaction accepted", "id": interaction.id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/analytics/batch", status_code=202)
+async def track_batch(request: Request, batch: AnalyticsBatchCreate):
+    """Track a mixed batch of page views and interactions in one request"""
+    try:
+        client_ip = _get_client_ip(request)
+        received_at = datetime.utcnow()
+        page_views = []
+        interactions = []
+        
+        # Events were validated as part of the batch, so build the stored
+        # documents without running validation a second time. The client
+        # queues events for a few seconds, so each carries its own age.
+        for event in batch.events:
+            fields = event.dict(exclude={"type", "age_ms"})
+            timestamp = _event_timestamp(received_at, event.age_ms)
+            if event.type == "pageview":
+                page_views.append(
+                    PageView.model_construct(**fields, ip_address=client_ip, timestamp=timestamp).dict()
+                )
+            else:
+                interactions.append(UserInteraction.model_construct(**fields, timestamp=timestamp).dict())
+        
+        # The write buffer groups these into unordered insert_many calls
+        accepted_views = await analytics_buffer.put_many("page_views", page_views)
+        accepted_interactions = await analytics_buffer.put_many("user_interactions", interactions)
+        accepted = len(accepted_views) + len(accepted_interactions)
+        
+        if accepted == 0:
+            raise _buffer_full()
+        
+        for page_view in accepted_views:
+            live_feed.page_view(page_view["page"])
+        for _ in accepted_interactions:
+            live_feed.interaction()
+        
+        return {
+            "message": "Batch accepted",
+            "page_views": len(accepted_views),
+            "interactions": len(accepted_interactions),
+            "dropped": len(page_views) + len(interactions) - accepted
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _top(counter, key_name: str, value_name: str, limit: int = 10):
+    """Format the largest counters as a list of {key_name, value_name} dicts"""
+    return [
+        {key_name: key, value_name: count}
+        for key, count in counter.most_common(limit)
+    ]
+
+class _StageTimer:
+    """Records how long each awaited query stage takes, for ?explain=1"""
+    
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+    
+    async def run(self, name: str, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.stages[name] = round((time.perf_counter() - start) * 1000, 2)
+    
+    def report(self):
+        return {
+            "stages_ms": self.stages,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2)
+        }
+
+def exact_unique_visitors_pipeline(start_date: datetime, end_date: datetime, pages=()):
+    """The $facet pipeline behind exact unique visitor counts"""
+    return [
+        {"$match": {"timestamp": {"$gte": start_date, "$lte": end_date}}},
+        {"$facet": {
+            # Unique visitors (based on IP + User Agent combination)
+            "overall": [
+                {"$group": {"_id": {"ip": "$ip_address", "ua": "$user_agent"}}},
+                {"$count": "unique_visitors"}
+            ],
+            "per_page": [
+                {"$match": {"page": {"$in": list(pages)}}},
+                {"$group": {"_id": "$page", "unique_visitors": {"$addToSet": "$ip_address"}}},
+                {"$project": {"unique_visitors": {"$size": "$unique_visitors"}}}
+            ],
+            "per_day": [
+                {"$group": {
+                    "_id": {"$dateFromParts": {
+                        "year": {"$year": "$timestamp"},
+                        "month": {"$month": "$timestamp"},
+                        "day": {"$dayOfMonth": "$timestamp"}
+                    }},
+                    "unique_visitors": {"$addToSet": "$ip_address"}
+                }},
+                {"$project": {"unique_visitors": {"$size": "$unique_visitors"}}}
+            ]
+        }}
+    ]
+
+async def _exact_unique_visitors(db, start_date: datetime, end_date: datetime, pages=()):
+    """Exact unique visitor counts from raw page views in one $facet pipeline.
+
+    Returns (overall, per page for the given pages, per day).
+    """
+    pipeline = exact_unique_visitors_pipeline(start_date, end_date, pages)
+    result = (await db.page_views.aggregate(pipeline).to_list(1))[0]
+    unique_visitors = result["overall"][0]["unique_visitors"] if result["overall"] else 0
+    per_page = {row["_id"]: row["unique_visitors"] for row in result["per_page"]}
+    per_day = {row["_id"]: row["unique_visitors"] for row in result["per_day"]}
+    
+    return unique_visitors, per_page, per_day
+
+async def _unique_visitors(db, start_date: datetime, end_date: datetime, pages=(), mode: Optional[str] = None):
+    """Unique visitor counts in the requested mode.
+
+    Returns (mode, overall, per page, per day).
+    """
+    mode = mode or UNIQUE_VISITORS_MODE
+    if mode == "exact":
+        return (mode, *await _exact_unique_visitors(db, start_date, end_date, pages))
+    if mode == "approximate":
+        return (mode, *await visitor_sketches.unique_visitors(db, start_date, end_date, pages))
+    raise HTTPException(status_code=400, detail="unique_mode must be 'exact' or 'approximate'")
+
+async def _build_summary(db, start_date: datetime, end_date: datetime, unique_mode: Optional[str], timer: _StageTimer):
+    """Build the analytics summary, running independent queries concurrently.
+
+    Returns (summary, rollups, daily unique visitors) so the dashboard can
+    reuse the same reads.
+    """
+    async def counters_and_uniques():
+        # Counters come from the hourly/daily rollups rather than raw events;
+        # per-page unique counts depend on which pages are on top
+        rollups = await timer.run("rollups", rollup_manager.read(db, start_date, end_date))
+        popular_pages = _top(rollups["pages"], "page", "views")
+        uniques = await timer.run("unique_visitors", _unique_visitors(
+            db, start_date, end_date, [page["page"] for page in popular_pages], unique_mode
+        ))
+        return rollups, popular_pages, uniques
+    
+    (rollups, popular_pages, uniques), sessions, contact_submissions = await asyncio.gather(
+        counters_and_uniques(),
+        # Session duration and bounce rate from the sessionized events
+        timer.run("sessions", session_manager.summary(db, start_date, end_date)),
+        # Contact form submissions
+        timer.run("contact_submissions", db.contact_messages.count_documents({
+            "created_at": {"$gte": start_date, "$lte": end_date}
+        }))
+    )
+    mode, unique_visitors, page_uniques, daily_uniques = uniques
+    
+    for page in popular_pages:
+        page["unique_visitors"] = page_uniques.get(page["page"], 0)
+    
+    summary = AnalyticsSummary(
+        total_views=rollups["views"],
+        unique_visitors=unique_visitors,
+        popular_pages=popular_pages,
+        top_referrers=_top(rollups["referrers"], "referrer", "count"),
+        avg_session_duration=sessions["avg_session_duration"],
+        bounce_rate=sessions["bounce_rate"],
+        contact_form_submissions=contact_submissions,
+        date_range={
+            "start": start_date,
+            "end": end_date
+        },
+        unique_visitors_mode=mode
+    )
+    
+    return summary, rollups, daily_uniques
+
 @router.get("/analytics/summary")
-async def get_analytics_summary(days: Optional[int] = 30):
+async def get_analytics_summary(
+    days: Optional[int] = 30,
+    unique_mode: Optional[str] = None,
+    explain: bool = False,
+    db = Depends(get_db)
+):
     """Get analytics summary for the specified period"""
     try:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Total page views
-        total_views = await db.page_views.count_documents({
-            "timestamp": {"$gte": start_date, "$lte": end_date}
-        })
-        
-        # Unique visitors (based on IP + User Agent combination)
-        unique_visitors_pipeline = [
-            {"$match": {"timestamp": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {
-                "_id": {"ip": "$ip_address", "ua": "$user_agent"},
-                "count": {"$sum": 1}
-            }},
-            {"$count": "unique_visitors"}
-        ]
-        
-        unique_visitors_result = await db.page_views.aggregate(unique_visitors_pipeline).to_list(1)
-        unique_visitors = unique_visitors_result[0]["unique_visitors"] if unique_visitors_result else 0
-        
-        # Popular pages
-        popular_pages_pipeline = [
-            {"$match": {"timestamp": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {
-                "_id": "$page",
-                "views": {"$sum": 1},
-                "unique_visitors": {"$addToSet": "$ip_address"}
-            }},
-            {"$project": {
-                "page": "$_id",
-                "views": 1,
-                "unique_visitors": {"$size": "$unique_visitors"}
-            }},
-            {"$sort": {"views": -1}},
-            {"$limit": 10}
-        ]
-        
-        popular_pages = await db.page_views.aggregate(popular_pages_pipeline).to_list(10)
-        
-        # Top referrers
-        referrers_pipeline = [
-            {"$match": {
-                "timestamp": {"$gte": start_date, "$lte": end_date},
-                "referrer": {"$ne": None, "$ne": ""}
-            }},
-            {"$group": {
-                "_id": "$referrer",
-                "count": {"$sum": 1}
-            }},
-            {"$project": {
-                "referrer": "$_id",
-                "count": 1
-            }},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        
-        top_referrers = await db.page_views.aggregate(referrers_pipeline).to_list(10)
-        
-        # Average session duration (mock calculation for now)
-        avg_session_duration = 120.5  # This would need proper session tracking
-        
-        # Bounce rate (mock calculation)
-        bounce_rate = 0.35  # 35% bounce rate
-        
-        # Contact form submissions
-        contact_submissions = await db.contact_messages.count_documents({
-            "created_at": {"$gte": start_date, "$lte": end_date}
-        })
-        
-        summary = AnalyticsSummary(
-            total_views=total_views,
-            unique_visitors=unique_visitors,
-            popular_pages=popular_pages,
-            top_referrers=top_referrers,
-            avg_session_duration=avg_session_duration,
-            bounce_rate=bounce_rate,
-            contact_form_submissions=contact_submissions,
-            date_range={
-                "start": start_date,
-                "end": end_date
-            }
-        )
+        timer = _StageTimer()
+        summary, _, _ = await _build_summary(db, start_date, end_date, unique_mode, timer)
         
+        if explain:
+            return {**summary.dict(), "explain": timer.report()}
         return summary
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/analytics/page-views")
+@router.get("/analytics/page-views", response_model=List[PageView])
 async def get_page_views(
+    request: Request,
     page: Optional[str] = None,
     days: Optional[int] = 7,
-    limit: Optional[int] = 100
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    db = Depends(get_db)
 ):
-    """Get page views with optional filtering"""
+    """Get page views with optional filtering, paginated by cursor or streamed as NDJSON"""
     try:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
@@ -165,23 +311,25 @@ async def get_page_views(
         if page:
             query["page"] = page
         
-        page_views = await db.page_views.find(
-            query, 
-            {"_id": 0}
-        ).sort("timestamp", -1).limit(limit).to_list(limit)
-        
-        return page_views
+        return await paginate(
+            request, db.page_views, query, PAGE_VIEW_PROJECTION, "timestamp", limit, cursor
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/analytics/interactions")
+@router.get("/analytics/interactions", response_model=List[UserInteraction])
 async def get_user_interactions(
+    request: Request,
     action: Optional[str] = None,
     page: Optional[str] = None,
     days: Optional[int] = 7,
-    limit: Optional[int] = 100
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    db = Depends(get_db)
 ):
-    """Get user interactions with optional filtering"""
+    """Get user interactions with optional filtering, paginated by cursor or streamed as NDJSON"""
     try:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
@@ -192,82 +340,163 @@ async def get_user_interactions(
         if page:
             query["page"] = page
         
-        interactions = await db.user_interactions.find(
-            query,
-            {"_id": 0}
-        ).sort("timestamp", -1).limit(limit).to_list(limit)
-        
-        return interactions
+        return await paginate(
+            request, db.user_interactions, query, INTERACTION_PROJECTION, "timestamp", limit, cursor
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/analytics/dashboard")
-async def get_analytics_dashboard():
-    """Get comprehensive analytics dashboard data"""
+@router.get("/analytics/export")
+async def export_analytics_events(
+    collection: str = "page_views",
+    format: str = "arrow",
+    days: int = Query(7, ge=1),
+    db = Depends(get_db)
+):
+    """Stream raw events as an Arrow IPC stream or a Parquet file, one batch at a time"""
     try:
-        # Get data for last 30 days
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
+        if collection not in EXPORT_COLLECTIONS:
+            raise HTTPException(
+                status_code=400, detail=f"collection must be one of {', '.join(EXPORT_COLLECTIONS)}"
+            )
+        if format not in EXPORT_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail="format must be 'arrow' or 'parquet'")
+        try:
+            require_pyarrow()
+        except RuntimeError as e:
+            raise HTTPException(status_code=501, detail=str(e))
         
-        # Daily page views for the last 30 days
-        daily_views_pipeline = [
-            {"$match": {"timestamp": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {
-                "_id": {
-                    "year": {"$year": "$timestamp"},
-                    "month": {"$month": "$timestamp"},
-                    "day": {"$dayOfMonth": "$timestamp"}
-                },
-                "views": {"$sum": 1},
-                "unique_visitors": {"$addToSet": "$ip_address"}
-            }},
-            {"$project": {
-                "date": {
-                    "$dateFromParts": {
-                        "year": "$_id.year",
-                        "month": "$_id.month",
-                        "day": "$_id.day"
-                    }
-                },
-                "views": 1,
-                "unique_visitors": {"$size": "$unique_visitors"}
-            }},
-            {"$sort": {"date": 1}}
-        ]
-        
-        daily_views = await db.page_views.aggregate(daily_views_pipeline).to_list(30)
-        
-        # Top interactions
-        top_interactions_pipeline = [
-            {"$match": {"timestamp": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {
-                "_id": "$action",
-                "count": {"$sum": 1}
-            }},
-            {"$project": {
-                "action": "$_id",
-                "count": 1
-            }},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        
-        top_interactions = await db.user_interactions.aggregate(top_interactions_pipeline).to_list(10)
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        extension = "arrows" if format == "arrow" else "parquet"
+        filename = f"{collection}-{start_date:%Y%m%d}-{end_date:%Y%m%d}.{extension}"
         
+        return StreamingResponse(
+            stream_export(db, collection, start_date, end_date, format),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def build_dashboard(db, unique_mode: Optional[str] = None, timer: Optional[_StageTimer] = None):
+    """Compute the dashboard payload for the last 30 days"""
+    timer = timer or _StageTimer()
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+    
+    # The summary and recent contacts hit different collections, so the
+    # dashboard costs as much as the slowest of them
+    (summary, rollups, daily_uniques), recent_contacts = await asyncio.gather(
+        _build_summary(db, start_date, end_date, unique_mode, timer),
         # Recent contact messages
-        recent_contacts = await db.contact_messages.find(
+        timer.run("recent_contacts", db.contact_messages.find(
             {"created_at": {"$gte": start_date, "$lte": end_date}},
             {"_id": 0, "message": 0}  # Exclude message content for privacy
-        ).sort("created_at", -1).limit(5).to_list(5)
-        
-        dashboard_data = {
-            "summary": await get_analytics_summary(30),
-            "daily_views": daily_views,
-            "top_interactions": top_interactions,
-            "recent_contacts": recent_contacts,
-            "last_updated": datetime.utcnow()
+        ).sort("created_at", -1).limit(5).to_list(5))
+    )
+    
+    # Daily views and top interactions from the rollups
+    daily_views = [
+        {
+            "date": day,
+            "views": views,
+            "unique_visitors": daily_uniques.get(day, 0)
         }
-        
-        return dashboard_data
+        for day, views in sorted(rollups["daily_views"].items())
+    ]
+    
+    return {
+        "summary": summary.dict(),
+        "daily_views": daily_views,
+        "top_interactions": _top(rollups["actions"], "action", "count"),
+        "recent_contacts": recent_contacts,
+        "unique_visitors_mode": summary.unique_visitors_mode
+    }
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+@router.get("/analytics/dashboard")
+async def get_analytics_dashboard(
+    request: Request,
+    unique_mode: Optional[str] = None,
+    explain: bool = False,
+    db = Depends(get_db)
+):
+    """Get comprehensive analytics dashboard data from the latest materialized snapshot"""
+    try:
+        if unique_mode or explain:
+            # Non-default variants are computed on demand
+            timer = _StageTimer()
+            dashboard_data = await build_dashboard(db, unique_mode, timer)
+            dashboard_data["last_updated"] = datetime.utcnow()
+            if explain:
+                dashboard_data["explain"] = timer.report()
+            return dashboard_data
+        
+        snapshot = await dashboard_snapshots.get()
+        headers = {
+            "ETag": snapshot.etag,
+            # Revalidate on every poll; unchanged snapshots cost a 304
+            "Cache-Control": "no-cache",
+            "Last-Modified": format_datetime(snapshot.generated_at.replace(tzinfo=timezone.utc), usegmt=True),
+        }
+        if _etag_matches(request.headers.get("if-none-match", ""), snapshot.etag):
+            return Response(status_code=304, headers=headers)
+        
+        response = snapshot.body.response(request.headers.get("accept-encoding", ""))
+        response.headers.update(headers)
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Seconds without updates after which a comment line keeps proxies from
+# closing an idle stream
+SSE_HEARTBEAT_SECONDS = 15
+
+@router.get("/analytics/stream")
+async def stream_analytics(request: Request):
+    """Live dashboard deltas as Server-Sent Events.
+    
+    Sends a snapshot of the current window on connect, then coalesced
+    deltas: page views and interactions since the last event, top pages
+    when they change and new contact submissions.
+    """
+    if not live_feed.can_subscribe():
+        raise HTTPException(status_code=503, detail="Too many live viewers", headers={"Retry-After": "30"})
+    
+    async def events():
+        # Subscribed only once the body streams, so a client that goes away
+        # before then never holds a slot
+        subscriber = live_feed.subscribe()
+        if subscriber is None:
+            # Filled up since the check above; EventSource retries later
+            yield b"retry: 30000\n" + sse_event("error", {"detail": "Too many live viewers"})
+            return
+        try:
+            event_id = 0
+            yield sse_event("snapshot", live_feed.snapshot(), event_id)
+            while True:
+                delta = await subscriber.next(SSE_HEARTBEAT_SECONDS)
+                if delta is None:
+                    yield b": heartbeat\n\n"
+                    continue
+                event_id += 1
+                yield sse_event("delta", delta, event_id)
+        finally:
+            live_feed.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
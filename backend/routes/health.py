@@ -1,5 +1,8 @@
 from fastapi import APIRouter, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
+from config.database import db_manager
+from config.monitoring import command_metrics, pool_metrics
+from config.metrics import metrics
+from fastapi.responses import PlainTextResponse
 import os
 from datetime import datetime
 import psutil
@@ -8,6 +11,8 @@ import logging
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
 @router.get("/health")
 async def health_check():
     """Basic health check endpoint for Railway"""
@@ -22,16 +27,13 @@ async def health_check():
 async def detailed_health_check():
     """Detailed health check with system and database status"""
     try:
-        # Database connection test (optional)
-        mongo_url = os.environ.get('MONGO_URL')
+        # Database connection test over the shared pooled client
         db_status = "not_configured"
         
-        if mongo_url:
+        if db_manager.client is not None:
             try:
-                client = AsyncIOMotorClient(mongo_url)
-                await client.admin.command('ping')
+                await db_manager.ping()
                 db_status = "connected"
-                client.close()
             except Exception as e:
                 db_status = f"error: {str(e)}"
                 logger.warning(f"Database connection failed: {e}")
@@ -43,7 +45,8 @@ async def detailed_health_check():
             "version": "1.0.0",
             "database": {
                 "status": db_status,
-                "type": "MongoDB"
+                "type": "MongoDB",
+                "pool": pool_metrics.snapshot()
             },
             "environment": os.environ.get("ENVIRONMENT", "development")
         }
@@ -61,22 +64,32 @@ async def detailed_health_check():
         }
 
 @router.get("/metrics")
-async def get_metrics():
-    """Get application metrics"""
+async def get_metrics(format: str = "json"):
+    """Get application metrics as JSON, or in Prometheus text format with ?format=prometheus"""
     try:
         from middleware.cache import cache
+        from services.analytics_buffer import analytics_buffer
+        
+        if format == "prometheus":
+            return PlainTextResponse(metrics.to_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+        if format != "json":
+            raise HTTPException(status_code=400, detail="format must be json or prometheus")
         
         return {
             "timestamp": datetime.utcnow(),
-            "cache": {
-                "size": cache.size(),
-                "type": "memory"
-            },
+            "cache": cache.stats(),
+            "analytics_buffer": analytics_buffer.metrics(),
+            "mongo_pool": pool_metrics.snapshot(),
+            "mongo_slow_queries": command_metrics.slow_queries(),
             "system": {
-                "uptime": "N/A",  # Could add process start time tracking
-                "requests_processed": "N/A"  # Could add request counter
-            }
+                "uptime_seconds": metrics.value("process_uptime_seconds"),
+                "requests_processed": metrics.value("http_requests_total"),
+                "requests_in_flight": metrics.value("http_requests_in_flight")
+            },
+            "metrics": metrics.to_json()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Metrics collection failed: {e}")
-        return {"error": "Failed to collect metrics"}
\ No newline at end of file
+        return {"error": "Failed to collect metrics"}
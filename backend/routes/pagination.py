@@ -0,0 +1,99 @@
+from fastapi import HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+import base64
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Largest page a list request may ask for; NDJSON streams are not capped
+MAX_PAGE_SIZE = 1000
+
+# Documents fetched per round trip, and per chunk written, when streaming
+NDJSON_BATCH_SIZE = 500
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def encode_cursor(timestamp: datetime, doc_id: str) -> str:
+    """Opaque continuation token for the position after (timestamp, id)"""
+    payload = orjson.dumps([timestamp.isoformat(), doc_id])
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Tuple[datetime, str]:
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        timestamp, doc_id = orjson.loads(payload)
+        return datetime.fromisoformat(timestamp), str(doc_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(field: str, token: str) -> Dict[str, Any]:
+    """Documents strictly after the cursor in (field desc, id desc) order"""
+    timestamp, doc_id = decode_cursor(token)
+    return {"$or": [
+        {field: {"$lt": timestamp}},
+        {field: timestamp, "id": {"$lt": doc_id}},
+    ]}
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def ndjson_response(cursor) -> StreamingResponse:
+    """Stream a Motor cursor as newline-delimited JSON, one batch per chunk"""
+    async def lines():
+        batch = []
+        try:
+            async for document in cursor:
+                batch.append(orjson.dumps(document))
+                if len(batch) >= NDJSON_BATCH_SIZE:
+                    yield b"\n".join(batch) + b"\n"
+                    batch = []
+            if batch:
+                yield b"\n".join(batch) + b"\n"
+        except Exception as e:
+            # Headers are already sent, so the stream just ends early
+            logger.error(f"❌ NDJSON stream failed: {e}")
+        finally:
+            # Also runs when the client disconnects mid-stream, so the
+            # server-side cursor is killed instead of left to time out
+            await cursor.close()
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+async def paginate(
+    request: Request,
+    collection,
+    query: Dict[str, Any],
+    projection: Dict[str, Any],
+    field: str,
+    limit: Optional[int],
+    cursor: Optional[str],
+    default_limit: int = 100
+):
+    """Keyset-paginated listing of a collection, newest first.
+
+    Pages are ordered by (field, id) descending. A full page carries the
+    token for the next one in X-Next-Cursor and a Link rel="next" header,
+    so the body stays a plain list. With Accept: application/x-ndjson the
+    matching documents are streamed instead, limited only if asked.
+    """
+    if cursor:
+        query = {**query, **keyset_filter(field, cursor)}
+    sort = [(field, -1), ("id", -1)]
+
+    if wants_ndjson(request):
+        mongo_cursor = collection.find(query, projection).sort(sort).batch_size(NDJSON_BATCH_SIZE)
+        if limit:
+            mongo_cursor = mongo_cursor.limit(limit)
+        return ndjson_response(mongo_cursor)
+
+    limit = min(limit or default_limit, MAX_PAGE_SIZE)
+    documents = await collection.find(query, projection).sort(sort).limit(limit).to_list(limit)
+    response = ORJSONResponse(documents)
+    if len(documents) == limit:
+        token = encode_cursor(documents[-1][field], documents[-1]["id"])
+        response.headers["X-Next-Cursor"] = token
+        next_url = request.url.include_query_params(cursor=token)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
@@ -1,17 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from models.portfolio import Portfolio, ContactMessage, ContactMessageCreate
 from datetime import datetime
-from middleware.cache import cached_response
-from middleware.rate_limiting import rate_limit, contact_limiter
+from typing import List, Optional
+from middleware.cache import cached_response, cache
 from config.database import get_db
+from routes.pagination import paginate
+from services.live_feed import live_feed
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.get("/portfolio")
-@cached_response(ttl=1800)  # Cache for 30 minutes
-@rate_limit()
+@cached_response(ttl=1800, tags=("portfolio",), stale_while_revalidate=300)  # Cache for 30 minutes
 async def get_portfolio(request: Request, db = Depends(get_db)):
     """Get complete portfolio data with caching"""
     try:
@@ -42,14 +43,16 @@ async def update_portfolio(portfolio_data: Portfolio, db = Depends(get_db)):
         if result.modified_count == 0 and result.upserted_id is None:
             raise HTTPException(status_code=400, detail="Failed to update portfolio")
         
+        # Purge cached reads that depend on the portfolio document
+        cache.invalidate_tags("portfolio")
+        
         return {"message": "Portfolio updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/contact")
-@rate_limit(limiter=contact_limiter)  # Stricter rate limit for contact form
-async def create_contact_message(message_data: ContactMessageCreate, request: Request, db = Depends(get_db)):
-    """Create a new contact message with rate limiting"""
+async def create_contact_message(message_data: ContactMessageCreate, db = Depends(get_db)):
+    """Create a new contact message (rate limited by RateLimitMiddleware)"""
     try:
         message = ContactMessage(**message_data.dict())
         message_dict = message.dict()
@@ -60,6 +63,8 @@ async def create_contact_message(message_data: ContactMessageCreate, request: Re
             raise HTTPException(status_code=400, detail="Failed to save message")
         
         logger.info(f"New contact message created: {message.id}")
+        # Same fields the dashboard lists; the message body stays private
+        live_feed.contact({key: value for key, value in message_dict.items() if key not in ("_id", "message")})
         return {
             "message": "Message sent successfully",
             "id": message.id
@@ -70,12 +75,23 @@ async def create_contact_message(message_data: ContactMessageCreate, request: Re
         logger.error(f"Error creating contact message: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/contact/messages")
-async def get_contact_messages(db = Depends(get_db)):
-    """Get all contact messages (admin endpoint)"""
+# Stored messages were validated on the way in; serialize them as read
+CONTACT_MESSAGE_PROJECTION = {"_id": 0, **{field: 1 for field in ContactMessage.model_fields}}
+
+@router.get("/contact/messages", response_model=List[ContactMessage])
+async def get_contact_messages(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    db = Depends(get_db)
+):
+    """Get contact messages, newest first (admin endpoint)"""
     try:
-        messages = await db.contact_messages.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-        return messages
+        return await paginate(
+            request, db.contact_messages, {}, CONTACT_MESSAGE_PROJECTION, "created_at", limit, cursor
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,20 +1,15 @@
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
 from models.portfolio import Portfolio, Personal, Skills, Experience, Project, Certification, Contact, Education, Skill
-import os
+from config.database import db_manager
 from dotenv import load_dotenv
 from pathlib import Path
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 async def seed_portfolio_data():
     """Seed the database with initial portfolio data"""
+    db = db_manager.get_database()
     
     # Check if portfolio already exists
     existing = await db.portfolio.find_one({})
@@ -143,8 +138,9 @@ async def seed_portfolio_data():
         print("❌ Failed to seed portfolio data")
 
 async def main():
+    await db_manager.connect()
     await seed_portfolio_data()
-    client.close()
+    await db_manager.disconnect()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
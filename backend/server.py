@@ -1,31 +1,40 @@
-from fastapi import FastAPI, APIRouter, Depends
+from fastapi import FastAPI, APIRouter, Depends, Query, Request
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from starlette.middleware.gzip import GZipMiddleware
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 import uuid
 from datetime import datetime
-from routes.portfolio import router as portfolio_router
-from routes.health import router as health_router
-from middleware.security import SecurityMiddleware
-from config.database import db_manager, get_db
 
+# Load environment before importing modules that read it at import time
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Enhanced logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('/tmp/portfolio_api.log')
-    ]
-)
+from routes.portfolio import router as portfolio_router
+from routes.health import router as health_router
+from routes.analytics import router as analytics_router, build_dashboard
+from middleware.security import SecurityMiddleware
+from middleware.rate_limiting import RateLimitMiddleware
+from middleware.metrics import MetricsMiddleware
+from middleware.compression import StreamingAwareGZipMiddleware
+from config.database import db_manager, get_db
+from routes.pagination import paginate
+from config.logging_setup import setup_logging
+from middleware.cache import cache
+from services.analytics_buffer import analytics_buffer
+from services.rollups import rollup_manager
+from services.visitor_sketches import visitor_sketches
+from services.sessionization import SESSION_TRACKING_MODE, session_manager
+from services.session_tracker import session_tracker
+from services.dashboard_snapshots import dashboard_snapshots
+from services.live_feed import live_feed
+
+# Queued JSON logging: handlers run on a background thread, not the event loop
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Create the main app with enhanced metadata
@@ -34,11 +43,14 @@ app = FastAPI(
     description="High-performance API for Data Science Portfolio",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse
 )
 
-# Add performance and security middlewares
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Add performance and security middlewares. Rate limiting is innermost so
+# 429s still get security and CORS headers, but it runs before routing.
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=1000, excluded_paths=("/api/analytics/stream",))
 app.add_middleware(SecurityMiddleware, enable_logging=True)
 
 # Create a router with the /api prefix
@@ -65,10 +77,21 @@ async def create_status_check(input: StatusCheckCreate, db = Depends(get_db)):
     _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
+# Documents we wrote ourselves already match the schema: project to its
+# fields and serialize them directly instead of re-validating each one
+STATUS_CHECK_PROJECTION = {"_id": 0, **{field: 1 for field in StatusCheck.model_fields}}
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks(db = Depends(get_db)):
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    db = Depends(get_db)
+):
+    return await paginate(
+        request, db.status_checks, {}, STATUS_CHECK_PROJECTION, "timestamp", limit, cursor,
+        default_limit=1000
+    )
 
 # Include portfolio routes
 api_router.include_router(portfolio_router)
@@ -76,6 +99,9 @@ api_router.include_router(portfolio_router)
 # Include health routes
 api_router.include_router(health_router)
 
+# Include analytics routes
+api_router.include_router(analytics_router)
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -85,14 +111,39 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link"],
 )
 
+# Outermost, so request metrics cover every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Application startup and shutdown events
 @app.on_event("startup")
 async def startup_db_client():
     """Initialize database connection on startup"""
     try:
         await db_manager.connect()
+        
+        # Rollups and visitor sketches are maintained from each batch the
+        # write buffer flushes
+        rollup_manager.attach(db_manager.get_database())
+        visitor_sketches.attach(db_manager.get_database())
+        analytics_buffer.add_flush_hook(rollup_manager.on_flush)
+        analytics_buffer.add_flush_hook(visitor_sketches.on_flush)
+        if SESSION_TRACKING_MODE == "streaming":
+            # Sessions are updated from each flushed batch as well
+            session_tracker.attach(db_manager.get_database())
+            analytics_buffer.add_flush_hook(session_tracker.on_flush)
+            await session_tracker.start()
+        else:
+            session_manager.attach(db_manager.get_database())
+            await session_manager.start()
+        await analytics_buffer.start(db_manager.get_database())
+        await visitor_sketches.start()
+        dashboard_snapshots.attach(db_manager.get_database(), build_dashboard)
+        await dashboard_snapshots.start()
+        await live_feed.start()
+        cache.start_sweeper()
         logger.info("✅ Application startup completed successfully")
     except Exception as e:
         logger.error(f"❌ Application startup failed: {e}")
@@ -102,6 +153,15 @@ async def startup_db_client():
 async def shutdown_db_client():
     """Close database connection on shutdown"""
     try:
+        await cache.stop_sweeper()
+        await session_manager.stop()
+        await dashboard_snapshots.stop()
+        await live_feed.stop()
+        
+        # Flush queued analytics events while the connection is still open
+        await analytics_buffer.stop()
+        await session_tracker.stop()
+        await visitor_sketches.stop()
         await db_manager.disconnect()
         logger.info("✅ Application shutdown completed successfully")
     except Exception as e:
@@ -115,5 +175,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=port,
         reload=False,
-        log_level="info"
+        log_level="info",
+        # Keep the queued handlers from setup_logging()
+        log_config=None
     )
@@ -0,0 +1,267 @@
+import asyncio
+import os
+import time
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+FlushHook = Callable[[str, List[Dict[str, Any]]], Awaitable[None]]
+
+# Write error code for a document whose _id is already stored
+DUPLICATE_KEY = 11000
+
+# Marks the end of the queue during shutdown so the flusher drains everything
+# enqueued before it and then exits
+_STOP = object()
+
+class AnalyticsWriteBuffer:
+    """Bounded write-behind queue for analytics events.
+
+    Ingest routes push documents and return immediately; a background task
+    drains the queue and writes size- or time-triggered batches with
+    unordered insert_many, one call per collection.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: str = "shed",
+        block_timeout: float = 0.5,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+    ):
+        if overflow not in ("shed", "block"):
+            raise ValueError("overflow must be 'shed' or 'block'")
+
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self.database = None
+        self.flush_hooks: List[FlushHook] = []
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+        self._accepting = False
+
+        # Counters
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def add_flush_hook(self, hook: FlushHook) -> None:
+        """Register a coroutine called with (collection, documents) after each write"""
+        self.flush_hooks.append(hook)
+
+    async def start(self, database) -> None:
+        """Start the background flusher"""
+        if self._task is not None:
+            return
+        self.database = database
+        self._accepting = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"✅ Analytics write buffer started "
+            f"(size={self.max_size}, batch={self.batch_size}, "
+            f"interval={self.flush_interval}s, overflow={self.overflow})"
+        )
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting events and flush everything already queued"""
+        if self._task is None:
+            return
+        self._accepting = False
+
+        async def drain() -> None:
+            # Waiting for room for the marker counts against the timeout too,
+            # in case the queue is full and the flusher is stuck
+            await self._queue.put(_STOP)
+            await self._task
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.warning(
+                f"⚠️ Analytics buffer drain timed out, "
+                f"{self._queue.qsize()} events discarded"
+            )
+        self._task = None
+        logger.info("✅ Analytics write buffer drained")
+
+    async def put(self, collection: str, document: Dict[str, Any]) -> bool:
+        """Queue one document; returns False when the event was shed"""
+        return bool(await self.put_many(collection, [document]))
+
+    async def put_many(self, collection: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Queue several documents; returns the ones that were accepted.
+
+        In block mode the whole call waits at most block_timeout for room,
+        however many documents it carries, and the accepted documents need
+        not be the leading ones.
+        """
+        if not self._accepting:
+            self.dropped += len(documents)
+            return []
+
+        accepted = []
+        deadline = None
+        for document in documents:
+            item = (collection, document)
+            try:
+                self._queue.put_nowait(item)
+            except asyncio.QueueFull:
+                if self.overflow == "shed":
+                    self.dropped += 1
+                    continue
+                loop = asyncio.get_running_loop()
+                if deadline is None:
+                    deadline = loop.time() + self.block_timeout
+                try:
+                    await asyncio.wait_for(self._queue.put(item), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    self.dropped += 1
+                    continue
+            self.enqueued += 1
+            accepted.append(document)
+        return accepted
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch: List[Tuple[str, Dict[str, Any]]] = [item]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Write one batch, grouped per collection"""
+        grouped: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for collection, document in batch:
+            grouped[collection].append(document)
+
+        start = time.perf_counter()
+        for collection, documents in grouped.items():
+            stored = await self._insert(collection, documents)
+            if not stored:
+                continue
+
+            for hook in self.flush_hooks:
+                try:
+                    await hook(collection, stored)
+                except Exception as e:
+                    logger.error(f"❌ Analytics flush hook failed for {collection}: {e}")
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+
+    async def _insert(self, collection: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert documents with unordered insert_many, returning the ones stored.
+
+        On a BulkWriteError every document except the rejected ones is
+        stored; a duplicate key means an earlier attempt already stored it.
+        Connection failures and retryable write errors are retried with
+        backoff, reusing the _ids insert_many assigned, so events accepted
+        with a 202 survive a brief outage or failover.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.database[collection].insert_many(documents, ordered=False)
+                self.written += len(documents)
+                return documents
+            except BulkWriteError as e:
+                rejected = {
+                    error["index"] for error in e.details.get("writeErrors", [])
+                    if error.get("code") != DUPLICATE_KEY
+                }
+                stored = [document for i, document in enumerate(documents) if i not in rejected]
+                self.written += len(stored)
+                self.failed += len(rejected)
+                if rejected:
+                    logger.error(f"❌ {len(rejected)} of {len(documents)} events rejected by {collection}: {e}")
+                return stored
+            except PyMongoError as e:
+                transient = isinstance(e, ConnectionFailure) or e.has_error_label("RetryableWriteError")
+                if not transient or attempt == self.max_retries:
+                    error = e
+                    break
+                self.retried += 1
+                logger.warning(
+                    f"⚠️ Retrying flush of {len(documents)} events to {collection} "
+                    f"(attempt {attempt + 1}): {e}"
+                )
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+            except Exception as e:
+                error = e
+                break
+
+        self.failed += len(documents)
+        logger.error(f"❌ Failed to flush {len(documents)} events to {collection}: {error}")
+        return []
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, throughput counters and flush latency"""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_size": self.max_size,
+            "overflow": self.overflow,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "retried": self.retried,
+            "flushes": self.flushes,
+            "flush_latency_ms": {
+                "last": round(self.last_flush_ms, 2),
+                "max": round(self.max_flush_ms, 2),
+                "avg": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            },
+        }
+
+# Global analytics write buffer
+analytics_buffer = AnalyticsWriteBuffer(
+    max_size=int(os.environ.get("ANALYTICS_BUFFER_SIZE", 10000)),
+    batch_size=int(os.environ.get("ANALYTICS_BATCH_SIZE", 500)),
+    flush_interval=float(os.environ.get("ANALYTICS_FLUSH_INTERVAL", 1.0)),
+    overflow=os.environ.get("ANALYTICS_BUFFER_OVERFLOW", "shed"),
+)
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import logging
+from bisect import bisect_left
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterator, List
+import orjson
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only exports need pyarrow; the rest of the app imports without it
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLLECTIONS = ("page_views", "user_interactions")
+
+# Documents per Motor fetch and per RecordBatch (one Parquet row group)
+EXPORT_BATCH_SIZE = 50_000
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    timestamp = pa.timestamp("us")
+    return {
+        "page_views": pa.schema([
+            ("id", pa.string()),
+            ("timestamp", timestamp),
+            ("page", pa.string()),
+            ("referrer", pa.string()),
+            ("session_id", pa.string()),
+            ("user_agent", pa.string()),
+            ("ip_address", pa.string()),
+            ("duration", pa.int64()),
+        ]),
+        "user_interactions": pa.schema([
+            ("id", pa.string()),
+            ("timestamp", timestamp),
+            ("page", pa.string()),
+            ("action", pa.string()),
+            ("element", pa.string()),
+            ("session_id", pa.string()),
+            # Free-form interaction data, kept as a JSON string
+            ("data", pa.string()),
+        ]),
+    }
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("Analytics export requires pyarrow (pip install pyarrow)")
+
+def schema_for(collection: str) -> "pa.Schema":
+    require_pyarrow()
+    if collection not in EXPORT_COLLECTIONS:
+        raise ValueError(f"collection must be one of {', '.join(EXPORT_COLLECTIONS)}")
+    return _schemas()[collection]
+
+def to_record_batch(documents: List[Dict[str, Any]], schema: "pa.Schema") -> "pa.RecordBatch":
+    """Build one column at a time from a batch of Mongo documents"""
+    columns = []
+    for field in schema:
+        values = [document.get(field.name) for document in documents]
+        if field.name == "data":
+            values = [orjson.dumps(value).decode() if value is not None else None for value in values]
+        columns.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+async def fetch_batches(
+    database,
+    collection: str,
+    start: datetime,
+    end: datetime,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Documents in [start, end) in timestamp order, batch_size at a time"""
+    schema = schema_for(collection)
+    projection = {"_id": 0, **{field.name: 1 for field in schema}}
+    cursor = database[collection].find(
+        {"timestamp": {"$gte": start, "$lt": end}}, projection
+    ).sort("timestamp", 1).batch_size(batch_size)
+    try:
+        while True:
+            documents = await cursor.to_list(batch_size)
+            if not documents:
+                return
+            yield documents
+    finally:
+        # Kill the server-side cursor when the consumer stops early
+        await cursor.close()
+
+def split_by_day(documents: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    """Split a timestamp-ordered batch at day boundaries"""
+    days = [document["timestamp"].date() for document in documents]
+    begin = 0
+    while begin < len(documents):
+        end = bisect_left(days, days[begin] + timedelta(days=1), lo=begin)
+        yield documents[begin:end]
+        begin = end
+
+class ParquetDayWriter:
+    """Writes a timestamp-ordered stream into Hive-style day partitions:
+    <directory>/<collection>/date=YYYY-MM-DD/part-0.parquet
+
+    Only the current day's file is open, and each batch becomes one row
+    group, so memory stays at about one batch regardless of range.
+    """
+
+    def __init__(self, directory: str, collection: str, compression: str = "zstd"):
+        self.directory = os.path.join(directory, collection)
+        self.schema = schema_for(collection)
+        self.compression = compression
+        self._writer = None
+        self._day = None
+        self.rows: Dict[str, int] = {}
+        self.files: List[str] = []
+
+    def _open(self, day) -> None:
+        self.close()
+        partition = os.path.join(self.directory, f"date={day.isoformat()}")
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, "part-0.parquet")
+        self._writer = pq.ParquetWriter(path, self.schema, compression=self.compression)
+        self._day = day
+        self.files.append(path)
+
+    def write(self, documents: List[Dict[str, Any]]) -> None:
+        for chunk in split_by_day(documents):
+            day = chunk[0]["timestamp"].date()
+            if day != self._day:
+                self._open(day)
+            self._writer.write_batch(to_record_batch(chunk, self.schema))
+            self.rows[day.isoformat()] = self.rows.get(day.isoformat(), 0) + len(chunk)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+async def export_to_parquet(
+    database,
+    collection: str,
+    start: datetime,
+    end: datetime,
+    directory: str,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> ParquetDayWriter:
+    """Write [start, end) of a collection as day-partitioned Parquet files.
+
+    Encoding and writing a batch runs in a thread while the next batch is
+    fetched, so at most two batches are in memory.
+    """
+    writer = ParquetDayWriter(directory, collection)
+    pending = None
+    try:
+        async with aclosing(fetch_batches(database, collection, start, end, batch_size)) as batches:
+            async for documents in batches:
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(asyncio.to_thread(writer.write, documents))
+            if pending is not None:
+                await pending
+    finally:
+        writer.close()
+    return writer
+
+class _ChunkSink:
+    """Write-only file object collecting bytes until they are drained"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+async def stream_export(
+    database,
+    collection: str,
+    start: datetime,
+    end: datetime,
+    format: str = "arrow",
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """Encode a time range as an Arrow IPC stream or a single Parquet file, batch by batch.
+
+    Both formats are written sequentially, so bytes are sent as soon as
+    each batch is encoded; only one batch is held in memory. The writer
+    and the Mongo cursor are closed even when the client disconnects or
+    encoding fails part way.
+    """
+    schema = schema_for(collection)
+    sink = _ChunkSink()
+    if format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+
+    closed = False
+    try:
+        async with aclosing(fetch_batches(database, collection, start, end, batch_size)) as batches:
+            async for documents in batches:
+                # Encoding a large batch is CPU-bound; keep it off the event loop
+                await asyncio.to_thread(lambda: write(to_record_batch(documents, schema)))
+                yield sink.drain()
+
+        closed = True
+        writer.close()
+        yield sink.drain()
+    finally:
+        if not closed:
+            try:
+                writer.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to close {format} export writer: {e}")
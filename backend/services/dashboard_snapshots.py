@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+import orjson
+from bson import Binary
+from middleware.cache import CachedBody
+from services.jobs import acquire_lease
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLLECTION = "dashboard_snapshots"
+SNAPSHOT_ID = "latest"
+
+# Builds the dashboard payload from the database
+DashboardBuilder = Callable[[Any], Awaitable[Dict[str, Any]]]
+
+class DashboardSnapshot:
+    """A materialized dashboard: serialized body, content ETag and generation time"""
+
+    __slots__ = ("body", "etag", "generated_at")
+
+    def __init__(self, body: bytes, etag: str, generated_at: datetime):
+        self.body = CachedBody(body)
+        self.etag = etag
+        self.generated_at = generated_at
+
+def content_etag(payload: Dict[str, Any]) -> str:
+    """Weak ETag over the dashboard content.
+
+    Weak because the same content is served gzip, brotli or identity
+    encoded. The reporting window slides with the clock and generation
+    timestamps are added afterwards, so both are left out: a refresh that
+    finds no new data keeps the ETag and pollers keep getting 304s.
+    """
+    content = {**payload, "summary": {**payload["summary"], "date_range": None}}
+    digest = hashlib.blake2b(orjson.dumps(content, option=orjson.OPT_SORT_KEYS), digest_size=16)
+    return f'W/"{digest.hexdigest()}"'
+
+class DashboardSnapshotManager:
+    """Keeps the admin dashboard materialized instead of computing it per request.
+
+    One worker at a time (holding a lease in analytics_jobs) rebuilds the
+    payload every refresh_interval seconds and stores it as a single
+    document; every worker serves an in-memory copy and reloads it when
+    the stored ETag changes.
+    """
+
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self.database = None
+        self.builder: Optional[DashboardBuilder] = None
+        self.current: Optional[DashboardSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.builds = 0
+        self.unchanged = 0
+        self.reloads = 0
+        self.last_build_ms = 0.0
+
+    def attach(self, database, builder: DashboardBuilder) -> None:
+        self.database = database
+        self.builder = builder
+
+    async def refresh(self) -> DashboardSnapshot:
+        """Rebuild the dashboard, storing it only when its content changed"""
+        started = time.perf_counter()
+        payload = await self.builder(self.database)
+        etag = content_etag(payload)
+        self.builds += 1
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+
+        if self.current is not None and self.current.etag == etag:
+            self.unchanged += 1
+            return self.current
+
+        generated_at = datetime.utcnow()
+        body = orjson.dumps({**payload, "generated_at": generated_at, "last_updated": generated_at})
+        await self.database[SNAPSHOT_COLLECTION].replace_one(
+            {"_id": SNAPSHOT_ID},
+            {"etag": etag, "generated_at": generated_at, "body": Binary(body)},
+            upsert=True
+        )
+        self.current = DashboardSnapshot(body, etag, generated_at)
+        return self.current
+
+    async def load(self) -> Optional[DashboardSnapshot]:
+        """Pick up the stored snapshot if another worker has built a newer one"""
+        stored = await self.database[SNAPSHOT_COLLECTION].find_one({"_id": SNAPSHOT_ID}, {"etag": 1})
+        if stored is None:
+            return self.current
+        if self.current is None or stored["etag"] != self.current.etag:
+            document = await self.database[SNAPSHOT_COLLECTION].find_one({"_id": SNAPSHOT_ID})
+            self.current = DashboardSnapshot(bytes(document["body"]), document["etag"], document["generated_at"])
+            self.reloads += 1
+        return self.current
+
+    async def get(self) -> DashboardSnapshot:
+        """The current snapshot, loading or building one if there is none yet"""
+        if self.current is not None:
+            return self.current
+        async with self._lock:
+            if self.current is None and await self.load() is None:
+                await self.refresh()
+            return self.current
+
+    async def start(self) -> None:
+        if self._task is None and self.database is not None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"✅ Dashboard snapshots refreshing every {self.refresh_interval}s")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self._lock:
+                    if await acquire_lease(self.database, "dashboard_snapshot", self.refresh_interval, datetime.utcnow()):
+                        await self.refresh()
+                    else:
+                        await self.load()
+            except Exception as e:
+                logger.error(f"❌ Dashboard snapshot refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generated_at": self.current.generated_at if self.current else None,
+            "builds": self.builds,
+            "unchanged": self.unchanged,
+            "reloads": self.reloads,
+            "last_build_ms": round(self.last_build_ms, 2),
+        }
+
+# Global dashboard snapshot manager
+dashboard_snapshots = DashboardSnapshotManager(
+    refresh_interval=float(os.environ.get("DASHBOARD_REFRESH_INTERVAL", 60)),
+)
@@ -0,0 +1,150 @@
+import hashlib
+import math
+from typing import Dict, Iterable, Optional
+import numpy as np
+
+def _sigma(x: float) -> float:
+    """Correction for empty registers in Ertl's estimator"""
+    if x == 1:
+        return math.inf
+    y = 1.0
+    z = x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+def _tau(x: float) -> float:
+    """Correction for saturated registers in Ertl's estimator"""
+    if x == 0 or x == 1:
+        return 0.0
+    y = 1.0
+    z = 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+class HyperLogLog:
+    """Mergeable cardinality sketch with constant memory.
+
+    Uses 2**precision one-byte registers; the default precision of 14
+    (16 KB) gives a standard error of about 0.8%. Counts use Ertl's improved
+    estimator ("New cardinality estimation algorithms for HyperLogLog
+    sketches", 2017), which stays unbiased through the switch from small
+    to large cardinalities without empirical bias tables. Small sketches
+    keep only their non-zero registers and switch to the dense array once
+    that stops saving space, so a page with a handful of visitors costs
+    bytes rather than kilobytes.
+    """
+
+    def __init__(self, precision: int = 14, registers: Optional[bytes] = None):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.m = 1 << precision
+        # Sparse entries take 4 bytes each, so from m / 4 on the dense form is smaller
+        self.sparse_limit = self.m // 4
+        self.registers: Optional[np.ndarray] = None
+        self.sparse: Optional[Dict[int, int]] = None
+        if registers is None:
+            self.sparse = {}
+        elif len(registers) == self.m:
+            self.registers = np.frombuffer(registers, dtype=np.uint8).copy()
+        elif len(registers) % 4 == 0 and len(registers) // 4 < self.sparse_limit:
+            entries = np.frombuffer(registers, dtype="<u4")
+            self.sparse = dict(zip((entries >> 8).tolist(), (entries & 0xFF).tolist()))
+        else:
+            raise ValueError("register size does not match precision")
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(
+            hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+
+    def _dense(self) -> np.ndarray:
+        if self.sparse is None:
+            return self.registers
+        registers = np.zeros(self.m, dtype=np.uint8)
+        if self.sparse:
+            registers[list(self.sparse)] = list(self.sparse.values())
+        return registers
+
+    def _densify(self) -> None:
+        self.registers = self._dense()
+        self.sparse = None
+
+    def add(self, value: str) -> None:
+        h = self._hash(value)
+        index = h >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        w = h & ((1 << remaining_bits) - 1)
+        # Position of the leftmost 1-bit in the remaining bits
+        rank = remaining_bits - w.bit_length() + 1
+        if self.sparse is not None:
+            if rank > self.sparse.get(index, 0):
+                self.sparse[index] = rank
+                if len(self.sparse) >= self.sparse_limit:
+                    self._densify()
+        elif rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[str]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Merge another sketch into this one (set union)"""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        if self.sparse is not None and other.sparse is not None:
+            for index, rank in other.sparse.items():
+                if rank > self.sparse.get(index, 0):
+                    self.sparse[index] = rank
+            if len(self.sparse) >= self.sparse_limit:
+                self._densify()
+            return self
+        if self.sparse is not None:
+            self._densify()
+        if other.sparse is not None:
+            for index, rank in other.sparse.items():
+                if rank > self.registers[index]:
+                    self.registers[index] = rank
+        else:
+            np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        """Estimated number of distinct values added"""
+        m = self.m
+        q = 64 - self.precision
+        # Histogram of register values; ranks run from 1 to q + 1
+        histogram = np.bincount(self._dense(), minlength=q + 2).tolist()
+        z = m * _tau(1 - histogram[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _sigma(histogram[0] / m)
+        return int(round(m * m / (2 * math.log(2) * z)))
+
+    def to_bytes(self) -> bytes:
+        """Dense registers, or little-endian (index << 8 | rank) words while sparse.
+
+        The two are told apart by length: dense is exactly m bytes and
+        sparse is always shorter.
+        """
+        if self.sparse is not None:
+            indexes = np.fromiter(self.sparse.keys(), dtype="<u4", count=len(self.sparse))
+            ranks = np.fromiter(self.sparse.values(), dtype="<u4", count=len(self.sparse))
+            return ((indexes << 8) | ranks).tobytes()
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, precision: int = 14) -> "HyperLogLog":
+        return cls(precision=precision, registers=data)
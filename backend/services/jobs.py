@@ -0,0 +1,18 @@
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+
+# Leases that let one worker at a time run a periodic background job
+JOB_COLLECTION = "analytics_jobs"
+
+async def acquire_lease(database, job: str, duration: float, now: datetime) -> bool:
+    """Claim `job` for `duration` seconds unless another worker holds an unexpired lease"""
+    try:
+        await database[JOB_COLLECTION].update_one(
+            {"_id": job, "expires_at": {"$lte": now}},
+            {"$set": {"expires_at": now + timedelta(seconds=duration)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The lease exists and has not expired
+        return False
@@ -0,0 +1,215 @@
+import asyncio
+import os
+import time
+import logging
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+import orjson
+
+logger = logging.getLogger(__name__)
+
+class FeedSubscriber:
+    """One connected viewer's pending updates, coalesced into a fixed-size state.
+
+    Per-second ticks are merged (counts summed, the latest top pages kept)
+    and only the newest contact submissions are kept, so a client that
+    reads slowly holds one merged delta rather than a growing queue.
+    """
+
+    __slots__ = ("page_views", "interactions", "seconds", "top_pages", "contacts", "dropped_contacts", "_ready")
+
+    def __init__(self, max_contacts: int):
+        self.page_views = 0
+        self.interactions = 0
+        self.seconds = 0
+        self.top_pages: Optional[List[Dict[str, Any]]] = None
+        self.contacts: Deque[Dict[str, Any]] = deque(maxlen=max_contacts)
+        self.dropped_contacts = 0
+        self._ready = asyncio.Event()
+
+    def add_tick(self, page_views: int, interactions: int, top_pages: Optional[List[Dict[str, Any]]]) -> None:
+        self.page_views += page_views
+        self.interactions += interactions
+        self.seconds += 1
+        if top_pages is not None:
+            self.top_pages = top_pages
+        self._ready.set()
+
+    def add_contact(self, contact: Dict[str, Any]) -> None:
+        if len(self.contacts) == self.contacts.maxlen:
+            self.dropped_contacts += 1
+        self.contacts.append(contact)
+        self._ready.set()
+
+    def drain(self) -> Dict[str, Any]:
+        """Everything pending as one delta, resetting the state"""
+        delta = {
+            "ts": time.time(),
+            "seconds": self.seconds,
+            "page_views": self.page_views,
+            "interactions": self.interactions,
+        }
+        if self.top_pages is not None:
+            delta["top_pages"] = self.top_pages
+        if self.contacts:
+            delta["contacts"] = list(self.contacts)
+        if self.dropped_contacts:
+            delta["contacts_dropped"] = self.dropped_contacts
+        self.page_views = self.interactions = self.seconds = self.dropped_contacts = 0
+        self.top_pages = None
+        self.contacts.clear()
+        self._ready.clear()
+        return delta
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """The next coalesced delta, or None if nothing arrived within timeout"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.drain()
+
+class LiveFeed:
+    """In-process pub/sub of dashboard deltas, fed by the ingest routes.
+
+    Ingest only bumps counters for the current second. A ticker folds them
+    into a sliding window once per second and fans one small update out to
+    every subscriber, so recording an event costs the same no matter how
+    many viewers are connected. Contact submissions are pushed as they
+    happen. Each worker publishes the events it ingested itself.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int = 300,
+        top_n: int = 5,
+        max_subscribers: int = 100,
+        max_contacts: int = 20
+    ):
+        self.top_n = top_n
+        self.max_subscribers = max_subscribers
+        self.max_contacts = max_contacts
+        self.subscribers: set = set()
+        self._task: Optional[asyncio.Task] = None
+
+        # Current second
+        self._page_views = 0
+        self._interactions = 0
+        self._pages: Counter = Counter()
+
+        # Sliding window of per-second page counts and their running total
+        self._window: Deque[Counter] = deque(maxlen=window_seconds)
+        self._window_pages: Counter = Counter()
+        self._top_pages: List[Dict[str, Any]] = []
+
+        # Counters
+        self.ticks = 0
+        self.rejected = 0
+
+    def page_view(self, page: str) -> None:
+        self._page_views += 1
+        self._pages[page] += 1
+
+    def interaction(self) -> None:
+        self._interactions += 1
+
+    def contact(self, contact: Dict[str, Any]) -> None:
+        for subscriber in self.subscribers:
+            subscriber.add_contact(contact)
+
+    def can_subscribe(self) -> bool:
+        """Whether a viewer would be admitted now; a refusal counts as rejected"""
+        if len(self.subscribers) >= self.max_subscribers:
+            self.rejected += 1
+            return False
+        return True
+
+    def subscribe(self) -> Optional[FeedSubscriber]:
+        """Register a viewer; None when the subscriber limit is reached"""
+        if len(self.subscribers) >= self.max_subscribers:
+            self.rejected += 1
+            return None
+        subscriber = FeedSubscriber(self.max_contacts)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: FeedSubscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current window state, sent when a viewer connects"""
+        return {
+            "ts": time.time(),
+            "window_seconds": self._window.maxlen,
+            "window_page_views": sum(self._window_pages.values()),
+            "top_pages": self._top_pages,
+        }
+
+    def tick(self) -> None:
+        """Close the current second and publish it"""
+        pages, self._pages = self._pages, Counter()
+        page_views, self._page_views = self._page_views, 0
+        interactions, self._interactions = self._interactions, 0
+        self.ticks += 1
+
+        if len(self._window) == self._window.maxlen:
+            self._window_pages.subtract(self._window[0])
+            # Drop pages that left the window so the counter stays small
+            self._window_pages = +self._window_pages
+        self._window.append(pages)
+        self._window_pages.update(pages)
+
+        top_pages = [
+            {"page": page, "views": views}
+            for page, views in self._window_pages.most_common(self.top_n) if views > 0
+        ]
+        changed = top_pages != self._top_pages
+        self._top_pages = top_pages
+
+        if page_views or interactions or changed:
+            for subscriber in self.subscribers:
+                subscriber.add_tick(page_views, interactions, top_pages if changed else None)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time() + 1
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            # Ticks missed while the loop was busy are folded into this one
+            next_tick = max(next_tick + 1, loop.time() + 0.5)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"❌ Live feed tick failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self.subscribers),
+            "ticks": self.ticks,
+            "rejected": self.rejected,
+        }
+
+def sse_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> bytes:
+    """Encode one Server-Sent Event"""
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id is not None else "")
+    return head.encode() + b"data: " + orjson.dumps(data) + b"\n\n"
+
+# Global live analytics feed
+live_feed = LiveFeed(
+    window_seconds=int(os.environ.get("LIVE_FEED_WINDOW_SECONDS", 300)),
+    max_subscribers=int(os.environ.get("LIVE_FEED_MAX_SUBSCRIBERS", 100)),
+)
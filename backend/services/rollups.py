@@ -0,0 +1,166 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+from pymongo import ReplaceOne, UpdateOne
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "analytics_rollups"
+GRANULARITIES = ("hour", "day")
+
+# Counter maps stored inside each bucket document
+DIMENSIONS = ("pages", "referrers", "actions")
+
+def _bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its hour or day"""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _bucket_id(granularity: str, bucket: datetime) -> str:
+    return f"{granularity}:{bucket.isoformat()}"
+
+def encode_key(key: str) -> str:
+    """Escape a page/referrer/action so it is a safe Mongo field name"""
+    return key.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def decode_key(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+class RollupAccumulator:
+    """Collects per-hour and per-day counters for a set of raw events"""
+
+    def __init__(self):
+        self.buckets: Dict[Tuple[str, datetime], Dict[str, Any]] = defaultdict(
+            lambda: {
+                "views": 0,
+                "interactions": 0,
+                **{dimension: Counter() for dimension in DIMENSIONS}
+            }
+        )
+
+    def add_page_view(self, page_view: Dict[str, Any]) -> None:
+        timestamp = page_view.get("timestamp")
+        if timestamp is None:
+            return
+        referrer = page_view.get("referrer")
+        for granularity in GRANULARITIES:
+            bucket = self.buckets[(granularity, _bucket_start(timestamp, granularity))]
+            bucket["views"] += 1
+            bucket["pages"][page_view.get("page") or "unknown"] += 1
+            if referrer:
+                bucket["referrers"][referrer] += 1
+
+    def add_interaction(self, interaction: Dict[str, Any]) -> None:
+        timestamp = interaction.get("timestamp")
+        if timestamp is None:
+            return
+        for granularity in GRANULARITIES:
+            bucket = self.buckets[(granularity, _bucket_start(timestamp, granularity))]
+            bucket["interactions"] += 1
+            bucket["actions"][interaction.get("action") or "unknown"] += 1
+
+    def add(self, collection: str, documents: List[Dict[str, Any]]) -> None:
+        if collection == "page_views":
+            for document in documents:
+                self.add_page_view(document)
+        elif collection == "user_interactions":
+            for document in documents:
+                self.add_interaction(document)
+
+    def increments(self) -> List[UpdateOne]:
+        """$inc upserts that add these counters to the stored buckets"""
+        operations = []
+        for (granularity, bucket), counters in self.buckets.items():
+            inc = {"views": counters["views"], "interactions": counters["interactions"]}
+            for dimension in DIMENSIONS:
+                for key, count in counters[dimension].items():
+                    inc[f"{dimension}.{encode_key(key)}"] = count
+            operations.append(UpdateOne(
+                {"_id": _bucket_id(granularity, bucket)},
+                {
+                    "$inc": inc,
+                    "$setOnInsert": {"granularity": granularity, "bucket": bucket}
+                },
+                upsert=True
+            ))
+        return operations
+
+    def replacements(self) -> List[ReplaceOne]:
+        """Upserts that overwrite the stored buckets with these counters"""
+        operations = []
+        for (granularity, bucket), counters in self.buckets.items():
+            document = {
+                "_id": _bucket_id(granularity, bucket),
+                "granularity": granularity,
+                "bucket": bucket,
+                "views": counters["views"],
+                "interactions": counters["interactions"],
+            }
+            for dimension in DIMENSIONS:
+                document[dimension] = {
+                    encode_key(key): count for key, count in counters[dimension].items()
+                }
+            operations.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+        return operations
+
+class RollupManager:
+    """Maintains hourly/daily analytics rollups and answers range queries from them"""
+
+    def __init__(self):
+        self.database = None
+
+    def attach(self, database) -> None:
+        self.database = database
+
+    async def on_flush(self, collection: str, documents: List[Dict[str, Any]]) -> None:
+        """Analytics buffer hook: fold a freshly written batch into the rollups"""
+        if self.database is None:
+            return
+        accumulator = RollupAccumulator()
+        accumulator.add(collection, documents)
+        operations = accumulator.increments()
+        if operations:
+            await self.database[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def bucket_query(start: datetime, end: datetime) -> Dict[str, Any]:
+        """Hourly buckets for the partial leading day, daily buckets after it"""
+        first_full_day = _bucket_start(start, "day")
+        if first_full_day < start:
+            first_full_day += timedelta(days=1)
+        return {"$or": [
+            {
+                "granularity": "hour",
+                "bucket": {"$gte": _bucket_start(start, "hour"), "$lt": first_full_day}
+            },
+            {
+                "granularity": "day",
+                "bucket": {"$gte": first_full_day, "$lte": end}
+            }
+        ]}
+
+    async def read(self, database, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Merge the buckets covering [start, end] into totals and a daily series"""
+        totals = {
+            "views": 0,
+            "interactions": 0,
+            **{dimension: Counter() for dimension in DIMENSIONS}
+        }
+        daily_views: Counter = Counter()
+
+        cursor = database[ROLLUP_COLLECTION].find(self.bucket_query(start, end))
+        async for bucket in cursor:
+            totals["views"] += bucket.get("views", 0)
+            totals["interactions"] += bucket.get("interactions", 0)
+            for dimension in DIMENSIONS:
+                for key, count in bucket.get(dimension, {}).items():
+                    totals[dimension][decode_key(key)] += count
+            daily_views[_bucket_start(bucket["bucket"], "day")] += bucket.get("views", 0)
+
+        totals["daily_views"] = daily_views
+        return totals
+
+# Global rollup manager
+rollup_manager = RollupManager()
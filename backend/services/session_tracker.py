@@ -0,0 +1,261 @@
+import asyncio
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+from services.sessionization import (
+    SESSION_CLOSING_ACTIONS, SESSION_COLLECTION, SESSION_TIMEOUT, epoch_ms, session_doc_id
+)
+from services.visitor_sketches import visitor_key
+
+logger = logging.getLogger(__name__)
+
+class OpenSession:
+    """One visitor session as seen by this worker since it was last evicted"""
+
+    __slots__ = (
+        "key", "start_time", "end_time", "pages", "interactions", "flushed_interactions",
+        "user_agent", "ip_address", "closed", "dirty"
+    )
+
+    def __init__(self, key: str, timestamp: datetime):
+        self.key = key
+        self.start_time = timestamp
+        self.end_time = timestamp
+        # Insertion-ordered set of pages
+        self.pages: Dict[str, None] = {}
+        self.interactions = 0
+        self.flushed_interactions = 0
+        self.user_agent: Optional[str] = None
+        self.ip_address: Optional[str] = None
+        self.closed = False
+        self.dirty = True
+
+    def touch(self, timestamp: datetime) -> None:
+        if timestamp < self.start_time:
+            self.start_time = timestamp
+        elif timestamp > self.end_time:
+            self.end_time = timestamp
+        self.dirty = True
+
+def _merge_update(session: OpenSession, interactions: int) -> List[Dict[str, Any]]:
+    """Update pipeline folding this worker's view of a session into the stored one.
+
+    Every step is a merge (earliest start, latest end, union of pages in
+    visit order, added interactions), so partial views of the same session
+    from several workers, or repeated flushes of an open one, combine into
+    a single document. Duration and bounce are then derived from the
+    merged fields.
+    """
+    existing_pages = {"$ifNull": ["$pages_visited", []]}
+    return [
+        {"$set": {
+            "id": {"$ifNull": ["$id", session_doc_id(session.key, epoch_ms(session.start_time))]},
+            "user_agent": {"$ifNull": ["$user_agent", {"$literal": session.user_agent}]},
+            "ip_address": {"$ifNull": ["$ip_address", {"$literal": session.ip_address}]},
+            "start_time": {"$min": ["$start_time", session.start_time]},
+            "end_time": {"$max": ["$end_time", session.end_time]},
+            "pages_visited": {"$concatArrays": [existing_pages, {"$filter": {
+                "input": {"$literal": list(session.pages)},
+                "cond": {"$not": [{"$in": ["$$this", existing_pages]}]}
+            }}]},
+            "interactions_count": {"$add": [
+                {"$ifNull": ["$interactions_count", 0]},
+                interactions - session.flushed_interactions
+            ]},
+        }},
+        {"$set": {
+            "total_duration": {"$toInt": {"$floor": {"$divide": [
+                {"$subtract": ["$end_time", "$start_time"]}, 1000
+            ]}}},
+            "is_bounce": {"$and": [
+                {"$lte": [{"$size": "$pages_visited"}, 1]},
+                {"$eq": ["$interactions_count", 0]}
+            ]},
+        }},
+    ]
+
+class SessionTracker:
+    """Incremental sessionization of analytics events as they are written.
+
+    Events update an in-memory table of open sessions keyed by session id
+    in O(1). A background task upserts changed sessions every few seconds
+    and evicts the ones that are closed (session_end/page_hidden) or idle
+    past the timeout. Upserts match a stored session for the same key that
+    overlaps within the timeout and merge into it, so sessions split across
+    workers or evicted early still end up as one document.
+    """
+
+    def __init__(
+        self,
+        timeout: timedelta = SESSION_TIMEOUT,
+        flush_interval: float = 5.0,
+        max_sessions: int = 100_000
+    ):
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.max_sessions = max_sessions
+        self.database = None
+        self.sessions: Dict[str, OpenSession] = {}
+        # Sessions replaced by a newer one for the same key, awaiting a final flush
+        self._finished: List[OpenSession] = []
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.events = 0
+        self.flushed = 0
+        self.evicted = 0
+        self.failed_flushes = 0
+
+    def attach(self, database) -> None:
+        self.database = database
+
+    def _session(self, key: str, timestamp: datetime) -> OpenSession:
+        session = self.sessions.get(key)
+        if session is not None and timestamp - session.end_time > self.timeout:
+            # Idle past the timeout: the old session is over, a new one starts
+            if session.dirty:
+                self._finished.append(session)
+            session = None
+        if session is None:
+            session = self.sessions[key] = OpenSession(key, timestamp)
+        else:
+            session.touch(timestamp)
+        return session
+
+    def add_page_view(self, page_view: Dict[str, Any]) -> None:
+        session = self._session(page_view.get("session_id") or visitor_key(page_view), page_view["timestamp"])
+        session.pages.setdefault(page_view.get("page") or "unknown")
+        if session.user_agent is None:
+            session.user_agent = page_view.get("user_agent")
+            session.ip_address = page_view.get("ip_address")
+        session.closed = False
+        self.events += 1
+
+    def add_interaction(self, interaction: Dict[str, Any]) -> None:
+        if not interaction.get("session_id"):
+            return
+        session = self._session(interaction["session_id"], interaction["timestamp"])
+        if interaction.get("action") in SESSION_CLOSING_ACTIONS:
+            session.closed = True
+        else:
+            session.interactions += 1
+            session.closed = False
+        self.events += 1
+
+    async def on_flush(self, collection: str, documents: List[Dict[str, Any]]) -> None:
+        """Analytics buffer hook: fold freshly written events into the open sessions"""
+        if collection == "page_views":
+            for document in documents:
+                self.add_page_view(document)
+        elif collection == "user_interactions":
+            for document in documents:
+                self.add_interaction(document)
+
+    def _operation(self, session: OpenSession, interactions: int) -> UpdateOne:
+        return UpdateOne(
+            {
+                "session_id": session.key,
+                "end_time": {"$gte": session.start_time - self.timeout},
+                "start_time": {"$lte": session.end_time + self.timeout},
+            },
+            _merge_update(session, interactions),
+            upsert=True
+        )
+
+    async def flush(self, everything: bool = False) -> int:
+        """Upsert changed sessions, then evict closed, idle or excess ones.
+
+        With `everything`, every open session is evicted, as on shutdown.
+        Events arriving while the write is in flight mark their session
+        dirty again, so it is kept and written on the next flush. Returns
+        the number of sessions written.
+        """
+        if self.database is None:
+            return 0
+        finished, self._finished = self._finished, []
+        pending = finished + [session for session in self.sessions.values() if session.dirty]
+        # Interaction counts as of this write; later events add to the next delta
+        counts = [session.interactions for session in pending]
+        for session in pending:
+            session.dirty = False
+
+        if pending:
+            try:
+                await self.database[SESSION_COLLECTION].bulk_write(
+                    [self._operation(session, count) for session, count in zip(pending, counts)],
+                    ordered=False
+                )
+            except Exception as e:
+                # Retry everything on the next flush. After a partial bulk
+                # write failure the applied upserts' interactions are added
+                # again; an acceptable error for analytics.
+                for session in pending:
+                    session.dirty = True
+                self._finished = finished + self._finished
+                self.failed_flushes += 1
+                logger.error(f"❌ Failed to flush {len(pending)} sessions: {e}")
+                return 0
+            for session, count in zip(pending, counts):
+                session.flushed_interactions = count
+            self.flushed += len(pending)
+
+        now = datetime.utcnow()
+        flushed = [(key, session) for key, session in self.sessions.items() if not session.dirty]
+        evict = [
+            key for key, session in flushed
+            if everything or session.closed or now - session.end_time > self.timeout
+        ]
+        excess = len(self.sessions) - len(evict) - self.max_sessions
+        if excess > 0:
+            # Least recently active first; their state is already stored
+            evicting = set(evict)
+            evict += [
+                key for key, session in sorted(flushed, key=lambda item: item[1].end_time)
+                if key not in evicting
+            ][:excess]
+        for key in evict:
+            del self.sessions[key]
+        self.evicted += len(evict)
+        return len(pending)
+
+    async def start(self) -> None:
+        if self._task is None and self.database is not None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"✅ Streaming session tracker started (flush every {self.flush_interval}s)")
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out every open session"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush(everything=True)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Session flush failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open_sessions": len(self.sessions),
+            "events": self.events,
+            "flushed": self.flushed,
+            "evicted": self.evicted,
+            "failed_flushes": self.failed_flushes,
+        }
+
+# Global streaming session tracker
+session_tracker = SessionTracker(
+    flush_interval=float(os.environ.get("SESSION_FLUSH_INTERVAL", 5.0)),
+    max_sessions=int(os.environ.get("SESSION_TRACKER_MAX_SESSIONS", 100_000)),
+)
@@ -0,0 +1,354 @@
+import asyncio
+import os
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from pymongo import ReplaceOne
+from services.jobs import acquire_lease
+from services.visitor_sketches import visitor_key
+
+logger = logging.getLogger(__name__)
+
+SESSION_COLLECTION = "analytics_sessions"
+
+# A visitor idle for longer than this starts a new session
+SESSION_TIMEOUT = timedelta(minutes=int(os.environ.get("SESSION_TIMEOUT_MINUTES", 30)))
+
+# Page lifecycle signals sent by the frontend. They mark when a visitor
+# left, so they extend and can close a session, but are not interactions.
+SESSION_CLOSING_ACTIONS = frozenset({"session_end", "page_hidden"})
+
+# 'batch' periodically recomputes sessions from raw events, 'streaming'
+# tracks them incrementally as events are written
+SESSION_TRACKING_MODE = os.environ.get("SESSION_TRACKING_MODE", "batch")
+
+# Documents per Motor fetch and per bulk_write when writing sessions
+FETCH_BATCH_SIZE = 50_000
+WRITE_BATCH_SIZE = 10_000
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+def epoch_ms(timestamp: datetime) -> int:
+    """Milliseconds since the epoch for a naive UTC datetime"""
+    return (timestamp - _EPOCH) // _MILLISECOND
+
+def session_doc_id(key: str, start_ms: int) -> str:
+    """Stable id for a session, so recomputing a window produces the same ids"""
+    return hashlib.blake2b(f"{key}:{start_ms}".encode(), digest_size=16).hexdigest()
+
+class EventColumns:
+    """Page views and interactions as parallel columns.
+
+    Session keys and pages are factorized to integer codes and timestamps
+    converted to epoch milliseconds while loading, so sessionization only
+    ever touches integer arrays.
+    """
+
+    def __init__(self):
+        self.keys: Dict[str, int] = {}
+        self.pages: Dict[str, int] = {}
+        self.key_codes: List[int] = []
+        self.page_codes: List[int] = []
+        self.times_ms: List[int] = []
+        self.is_view: List[bool] = []
+        self.is_signal: List[bool] = []
+        self.user_agents: List[Optional[str]] = []
+        self.ip_addresses: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.key_codes)
+
+    def add_page_views(self, documents: List[Dict[str, Any]]) -> None:
+        keys, pages = self.keys, self.pages
+        # Page views without a session id fall back to the visitor identity
+        self.key_codes.extend(
+            keys.setdefault(document.get("session_id") or visitor_key(document), len(keys))
+            for document in documents
+        )
+        self.page_codes.extend(
+            pages.setdefault(document.get("page") or "unknown", len(pages)) for document in documents
+        )
+        # Plain timedelta arithmetic beats numpy's datetime object conversion
+        self.times_ms.extend((document["timestamp"] - _EPOCH) // _MILLISECOND for document in documents)
+        self.is_view.extend([True] * len(documents))
+        self.is_signal.extend([False] * len(documents))
+        self.user_agents.extend(document.get("user_agent") for document in documents)
+        self.ip_addresses.extend(document.get("ip_address") for document in documents)
+
+    def add_interactions(self, documents: List[Dict[str, Any]]) -> None:
+        # Interactions carry no visitor identity, so only those tagged with
+        # a session can be attributed
+        documents = [document for document in documents if document.get("session_id")]
+        keys, pages = self.keys, self.pages
+        self.key_codes.extend(keys.setdefault(document["session_id"], len(keys)) for document in documents)
+        self.page_codes.extend(
+            pages.setdefault(document.get("page") or "unknown", len(pages)) for document in documents
+        )
+        self.times_ms.extend((document["timestamp"] - _EPOCH) // _MILLISECOND for document in documents)
+        self.is_view.extend([False] * len(documents))
+        self.is_signal.extend(document.get("action") in SESSION_CLOSING_ACTIONS for document in documents)
+        self.user_agents.extend([None] * len(documents))
+        self.ip_addresses.extend([None] * len(documents))
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(key codes, epoch milliseconds, page codes, is page view, is lifecycle signal)"""
+        return (
+            np.asarray(self.key_codes, dtype=np.int64),
+            np.asarray(self.times_ms, dtype=np.int64),
+            np.asarray(self.page_codes, dtype=np.int64),
+            np.asarray(self.is_view, dtype=bool),
+            np.asarray(self.is_signal, dtype=bool),
+        )
+
+def sessionize_arrays(
+    key_codes: np.ndarray,
+    times_ms: np.ndarray,
+    page_codes: np.ndarray,
+    is_view: np.ndarray,
+    is_signal: np.ndarray,
+    timeout_ms: int
+) -> Dict[str, np.ndarray]:
+    """Split events into sessions and compute per-session statistics.
+
+    Events are sorted by (key, time); a session starts wherever the key
+    changes or the gap to the previous event exceeds the timeout. All
+    per-session values are segment reductions over the sorted arrays.
+    Distinct pages are returned flattened: `page_codes` holds each
+    session's page views in first-visit order, `distinct_pages` the
+    number belonging to each session. Expects at least one event.
+    """
+    count = len(key_codes)
+    order = np.lexsort((times_ms, key_codes))
+    keys = key_codes[order]
+    times = times_ms[order]
+    pages = page_codes[order]
+    views = is_view[order]
+
+    boundary = np.empty(count, dtype=bool)
+    boundary[:1] = True
+    np.not_equal(keys[1:], keys[:-1], out=boundary[1:])
+    boundary[1:] |= np.diff(times) > timeout_ms
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], count) - 1
+    session_of = np.cumsum(boundary) - 1
+
+    events = np.diff(np.append(starts, count))
+    counted = views | is_signal[order]
+    interactions = events - np.add.reduceat(counted.astype(np.int64), starts)
+
+    # First event position of each distinct (session, page) pair among page
+    # views; positions are grouped by session, so sorting them yields every
+    # session's pages in the order they were first visited
+    view_positions = np.flatnonzero(views)
+    pairs = session_of[view_positions] * (int(pages.max()) + 1) + pages[view_positions]
+    _, first = np.unique(pairs, return_index=True)
+    first_visits = view_positions[np.sort(first)]
+    distinct_pages = np.bincount(session_of[first_visits], minlength=len(starts))
+
+    # User agent and IP come from each session's first page view
+    first_view = np.minimum.reduceat(np.where(views, np.arange(count), count), starts)
+
+    return {
+        "key": keys[starts],
+        "start_ms": times[starts],
+        "end_ms": times[ends],
+        "duration_s": (times[ends] - times[starts]) // 1000,
+        "interactions": interactions,
+        "distinct_pages": distinct_pages,
+        "page_codes": pages[first_visits],
+        "is_bounce": (distinct_pages <= 1) & (interactions == 0),
+        # Index into the unsorted columns, or -1 for sessions without a page view
+        "first_view": np.where(first_view < count, order[np.minimum(first_view, count - 1)], -1),
+    }
+
+def build_sessions(
+    columns: EventColumns,
+    timeout: timedelta = SESSION_TIMEOUT,
+    since: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """AnalyticsSession documents for the loaded events, optionally only those starting at or after `since`"""
+    if not len(columns):
+        return []
+    result = sessionize_arrays(*columns.arrays(), int(timeout.total_seconds() * 1000))
+
+    keep = np.ones(len(result["key"]), dtype=bool)
+    if since is not None:
+        keep = result["start_ms"] >= epoch_ms(since)
+    page_offsets = np.append(0, np.cumsum(result["distinct_pages"]))
+
+    key_names = list(columns.keys)
+    keys = result["key"].tolist()
+    start_ms = result["start_ms"].tolist()
+    page_names = np.array(list(columns.pages), dtype=object)[result["page_codes"]].tolist()
+    start_times = result["start_ms"].astype("datetime64[ms]").tolist()
+    end_times = result["end_ms"].astype("datetime64[ms]").tolist()
+    durations = result["duration_s"].tolist()
+    interactions = result["interactions"].tolist()
+    bounces = result["is_bounce"].tolist()
+    offsets = page_offsets.tolist()
+    first_views = result["first_view"].tolist()
+
+    user_agents, ip_addresses = columns.user_agents, columns.ip_addresses
+    # Only the session dict and its page list are allocated per session
+    return [
+        {
+            "id": session_doc_id(key_names[keys[i]], start_ms[i]),
+            "session_id": key_names[keys[i]],
+            "user_agent": user_agents[first_views[i]] if first_views[i] >= 0 else None,
+            "ip_address": ip_addresses[first_views[i]] if first_views[i] >= 0 else None,
+            "start_time": start_times[i],
+            "end_time": end_times[i],
+            "total_duration": durations[i],
+            "pages_visited": page_names[offsets[i]:offsets[i + 1]],
+            "interactions_count": interactions[i],
+            "is_bounce": bounces[i],
+        }
+        for i in np.flatnonzero(keep).tolist()
+    ]
+
+async def load_events(database, start: datetime, end: datetime) -> EventColumns:
+    """Columns of every page view and interaction in [start, end]"""
+    columns = EventColumns()
+    window = {"timestamp": {"$gte": start, "$lte": end}}
+    sources = (
+        ("page_views", {"_id": 0, "session_id": 1, "timestamp": 1, "page": 1, "user_agent": 1, "ip_address": 1},
+         columns.add_page_views),
+        ("user_interactions", {"_id": 0, "session_id": 1, "timestamp": 1, "page": 1, "action": 1},
+         columns.add_interactions),
+    )
+    for collection, projection, add in sources:
+        cursor = database[collection].find(window, projection).batch_size(FETCH_BATCH_SIZE)
+        while True:
+            documents = await cursor.to_list(FETCH_BATCH_SIZE)
+            if not documents:
+                break
+            add(documents)
+    return columns
+
+class SessionManager:
+    """Rebuilds analytics_sessions from raw events and summarizes them.
+
+    Each refresh recomputes the sessions starting in a window. Events from
+    one timeout before the window are loaded too, so a session already
+    running at the window start is recognised and not cut short. Sessions
+    are upserted by their stable id and only then are those in the window
+    that the recomputation no longer produced deleted, so readers never
+    see the window empty and refreshes stay idempotent. With several workers, a lease in analytics_jobs
+    ensures only one of them refreshes per interval.
+    """
+
+    def __init__(
+        self,
+        timeout: timedelta = SESSION_TIMEOUT,
+        refresh_interval: float = 300.0,
+        window: timedelta = timedelta(hours=24)
+    ):
+        self.timeout = timeout
+        self.refresh_interval = refresh_interval
+        self.window = window
+        self.database = None
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.last_refresh_ms = 0.0
+        self.last_sessions = 0
+
+    def attach(self, database) -> None:
+        self.database = database
+
+    async def refresh(self, database, start: datetime, end: datetime) -> int:
+        """Recompute and store the sessions starting in [start, end]; returns how many"""
+        started = time.perf_counter()
+        columns = await load_events(database, start - self.timeout, end)
+        # Sorting and reductions over millions of events take a few hundred
+        # milliseconds; keep them off the event loop
+        sessions = await asyncio.to_thread(build_sessions, columns, self.timeout, start)
+
+        # Every session written by this refresh carries its timestamp, so
+        # the leftovers of earlier ones can be told apart afterwards
+        refreshed_at = datetime.utcnow()
+        collection = database[SESSION_COLLECTION]
+        for i in range(0, len(sessions), WRITE_BATCH_SIZE):
+            batch = sessions[i:i + WRITE_BATCH_SIZE]
+            for session in batch:
+                session["refreshed_at"] = refreshed_at
+            await collection.bulk_write(
+                [ReplaceOne({"id": session["id"]}, session, upsert=True) for session in batch],
+                ordered=False
+            )
+        await collection.delete_many({
+            "start_time": {"$gte": start, "$lte": end},
+            "refreshed_at": {"$ne": refreshed_at},
+        })
+
+        self.refreshes += 1
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+        self.last_sessions = len(sessions)
+        logger.info(
+            f"✅ Sessionized {len(columns)} events into {len(sessions)} sessions "
+            f"in {self.last_refresh_ms:.0f}ms"
+        )
+        return len(sessions)
+
+    async def start(self) -> None:
+        """Refresh the trailing window periodically in the background"""
+        if self._task is None and self.database is not None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            end = datetime.utcnow()
+            try:
+                if await acquire_lease(self.database, "sessionization", self.refresh_interval, end):
+                    await self.refresh(self.database, end - self.window, end)
+            except Exception as e:
+                logger.error(f"❌ Sessionization failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    @staticmethod
+    async def summary(database, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Session count, average duration (seconds) and bounce rate for sessions starting in [start, end]"""
+        pipeline = [
+            {"$match": {"start_time": {"$gte": start, "$lte": end}}},
+            {"$group": {
+                "_id": None,
+                "sessions": {"$sum": 1},
+                "avg_duration": {"$avg": "$total_duration"},
+                "bounces": {"$sum": {"$cond": ["$is_bounce", 1, 0]}}
+            }}
+        ]
+        result = await database[SESSION_COLLECTION].aggregate(pipeline).to_list(1)
+        if not result or not result[0]["sessions"]:
+            return {"sessions": 0, "avg_session_duration": 0.0, "bounce_rate": 0.0}
+        sessions = result[0]["sessions"]
+        return {
+            "sessions": sessions,
+            "avg_session_duration": round(result[0]["avg_duration"] or 0.0, 1),
+            "bounce_rate": round(result[0]["bounces"] / sessions, 4),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "refreshes": self.refreshes,
+            "last_refresh_ms": round(self.last_refresh_ms, 2),
+            "last_sessions": self.last_sessions,
+        }
+
+# Global session manager
+session_manager = SessionManager(
+    refresh_interval=float(os.environ.get("SESSIONIZATION_INTERVAL", 300)),
+    window=timedelta(hours=float(os.environ.get("SESSIONIZATION_WINDOW_HOURS", 24))),
+)
@@ -0,0 +1,272 @@
+import asyncio
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pymongo import UpdateOne
+from services.hyperloglog import HyperLogLog
+from services.jobs import acquire_lease
+
+logger = logging.getLogger(__name__)
+
+SKETCH_COLLECTION = "analytics_sketches"
+
+# Page key for the site-wide sketch kept alongside the per-page ones
+ALL_PAGES = "*"
+
+# Id prefix of the single document compaction leaves per day and page
+MERGED_OWNER = "merged"
+
+def _day(timestamp: datetime) -> datetime:
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def visitor_key(page_view: Dict[str, Any]) -> str:
+    """Visitor identity used for unique counts (IP + User Agent)"""
+    return f"{page_view.get('ip_address') or ''}|{page_view.get('user_agent') or ''}"
+
+class VisitorSketchManager:
+    """Per-page, per-day HyperLogLog sketches of unique visitors.
+
+    Each in-memory sketch is persisted under its own document id, so
+    workers never read-modify-write each other's registers. Readers merge
+    every sketch stored for a day, which loses nothing because merging
+    is a set union. Passing a fixed owner (e.g. for a backfill) makes the
+    ids deterministic so re-runs overwrite their previous output.
+
+    Pages come from clients, so only the first max_pages pages seen each
+    day get their own sketch; the site-wide sketch still counts every
+    visitor. Days that no worker writes to any more are compacted into a
+    single document per page.
+    """
+
+    def __init__(
+        self,
+        precision: int = 14,
+        persist_interval: float = 10.0,
+        max_pages: int = 500,
+        compact_interval: float = 3600.0,
+        owner: Optional[str] = None
+    ):
+        self.precision = precision
+        self.persist_interval = persist_interval
+        self.max_pages = max_pages
+        self.compact_interval = compact_interval
+        self.owner = owner
+        self.database = None
+        self.sketches: Dict[Tuple[datetime, str], HyperLogLog] = {}
+        self._doc_ids: Dict[Tuple[datetime, str], str] = {}
+        self._pages: Dict[datetime, set] = {}
+        self._dirty: set = set()
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.untracked_views = 0
+        self.compacted = 0
+
+    def attach(self, database) -> None:
+        self.database = database
+
+    def _sketch(self, day: datetime, page: str) -> Optional[HyperLogLog]:
+        sketch = self.sketches.get((day, page))
+        if sketch is None:
+            if page != ALL_PAGES:
+                pages = self._pages.setdefault(day, set())
+                if len(pages) >= self.max_pages:
+                    self.untracked_views += 1
+                    return None
+                pages.add(page)
+            sketch = self.sketches[(day, page)] = HyperLogLog(self.precision)
+            self._doc_ids[(day, page)] = self._doc_id(day, page)
+        return sketch
+
+    def add_page_views(self, page_views: Iterable[Dict[str, Any]]) -> None:
+        for page_view in page_views:
+            timestamp = page_view.get("timestamp")
+            if timestamp is None:
+                continue
+            key = visitor_key(page_view)
+            day = _day(timestamp)
+            for page in (page_view.get("page") or "unknown", ALL_PAGES):
+                sketch = self._sketch(day, page)
+                if sketch is not None:
+                    sketch.add(key)
+                    self._dirty.add((day, page))
+
+    def _doc_id(self, day: datetime, page: str) -> str:
+        if self.owner:
+            return f"{self.owner}:{day.date().isoformat()}:{page}"
+        return f"{os.getpid()}-{uuid.uuid4().hex[:12]}:{day.date().isoformat()}:{page}"
+
+    async def on_flush(self, collection: str, documents: List[Dict[str, Any]]) -> None:
+        """Analytics buffer hook: add written page views to the sketches"""
+        if collection == "page_views":
+            self.add_page_views(documents)
+
+    async def persist(self) -> None:
+        """Write dirty sketches and drop in-memory sketches for past days"""
+        if self.database is None or not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        operations = []
+        for key in dirty:
+            day, page = key
+            operations.append(UpdateOne(
+                {"_id": self._doc_ids[key]},
+                {"$set": {
+                    "day": day,
+                    "page": page,
+                    "precision": self.precision,
+                    "registers": self.sketches[key].to_bytes(),
+                    "updated_at": datetime.utcnow()
+                }},
+                upsert=True
+            ))
+        try:
+            await self.database[SKETCH_COLLECTION].bulk_write(operations, ordered=False)
+        except Exception:
+            # Written again on the next persist
+            self._dirty |= dirty
+            raise
+
+        # Late events for yesterday still arrive around midnight; anything
+        # older starts a new sketch document if it shows up again
+        if self.owner is None:
+            self.evict_before(_day(datetime.utcnow()) - timedelta(days=1))
+
+    def evict_before(self, day: datetime) -> None:
+        """Drop persisted in-memory sketches for days before the given one"""
+        for key in [key for key in self.sketches if key[0] < day and key not in self._dirty]:
+            del self.sketches[key]
+            del self._doc_ids[key]
+        for past in [past for past in self._pages if past < day]:
+            if not any(key[0] == past for key in self._dirty):
+                del self._pages[past]
+
+    async def compact(self, before: datetime) -> int:
+        """Merge every sketch document for each day before `before` into one.
+
+        Only days no worker still holds in memory should be compacted; a
+        late event starts a new document, which the next run folds in.
+        Returns the number of documents merged away.
+        """
+        groups = await self.database[SKETCH_COLLECTION].aggregate([
+            {"$match": {"day": {"$lt": before}}},
+            {"$group": {
+                "_id": {"day": "$day", "page": "$page", "precision": "$precision"},
+                "ids": {"$push": "$_id"}
+            }},
+            {"$match": {"ids.1": {"$exists": True}}}
+        ]).to_list(None)
+
+        merged_away = 0
+        for group in groups:
+            day, page, precision = group["_id"]["day"], group["_id"]["page"], group["_id"]["precision"]
+            merged = HyperLogLog(precision)
+            async for document in self.database[SKETCH_COLLECTION].find(
+                {"_id": {"$in": group["ids"]}}, {"registers": 1}
+            ):
+                merged.merge(HyperLogLog.from_bytes(document["registers"], precision))
+
+            merged_id = f"{MERGED_OWNER}:{day.date().isoformat()}:{page}"
+            await self.database[SKETCH_COLLECTION].update_one(
+                {"_id": merged_id},
+                {"$set": {
+                    "day": day,
+                    "page": page,
+                    "precision": precision,
+                    "registers": merged.to_bytes(),
+                    "updated_at": datetime.utcnow()
+                }},
+                upsert=True
+            )
+            stale = [doc_id for doc_id in group["ids"] if doc_id != merged_id]
+            await self.database[SKETCH_COLLECTION].delete_many({"_id": {"$in": stale}})
+            merged_away += len(stale)
+
+        self.compacted += merged_away
+        return merged_away
+
+    async def start(self) -> None:
+        if self._task is None and self.database is not None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"✅ Visitor sketches persisting every {self.persist_interval}s")
+
+    async def stop(self) -> None:
+        """Stop the periodic persist and write out what is still in memory"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.persist()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_compaction = loop.time()
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            try:
+                await self.persist()
+            except Exception as e:
+                logger.error(f"❌ Visitor sketch persist failed: {e}")
+
+            if loop.time() < next_compaction:
+                continue
+            next_compaction = loop.time() + self.compact_interval
+            try:
+                now = datetime.utcnow()
+                if await acquire_lease(self.database, "sketch_compaction", self.compact_interval, now):
+                    # Workers keep yesterday and today in memory
+                    merged_away = await self.compact(_day(now) - timedelta(days=1))
+                    if merged_away:
+                        logger.info(f"✅ Compacted {merged_away} visitor sketch documents")
+            except Exception as e:
+                logger.error(f"❌ Visitor sketch compaction failed: {e}")
+
+    async def unique_visitors(
+        self,
+        database,
+        start: datetime,
+        end: datetime,
+        pages: Iterable[str] = ()
+    ) -> Tuple[int, Dict[str, int], Dict[datetime, int]]:
+        """Approximate unique visitors by merging the sketches in [start, end].
+
+        Returns (overall, per page for the given pages, per day). Ranges
+        are resolved to whole days.
+        """
+        pages = list(pages)
+        overall = HyperLogLog(self.precision)
+        per_page: Dict[str, HyperLogLog] = {}
+        per_day: Dict[datetime, HyperLogLog] = {}
+
+        cursor = database[SKETCH_COLLECTION].find(
+            {
+                "day": {"$gte": _day(start), "$lte": end},
+                "page": {"$in": pages + [ALL_PAGES]},
+                "precision": self.precision
+            },
+            {"_id": 0, "day": 1, "page": 1, "registers": 1}
+        )
+        async for document in cursor:
+            sketch = HyperLogLog.from_bytes(document["registers"], self.precision)
+            if document["page"] == ALL_PAGES:
+                overall.merge(sketch)
+                per_day.setdefault(document["day"], HyperLogLog(self.precision)).merge(sketch)
+            else:
+                per_page.setdefault(document["page"], HyperLogLog(self.precision)).merge(sketch)
+
+        return (
+            overall.count(),
+            {page: sketch.count() for page, sketch in per_page.items()},
+            {day: sketch.count() for day, sketch in per_day.items()},
+        )
+
+# Global visitor sketch manager
+visitor_sketches = VisitorSketchManager(
+    persist_interval=float(os.environ.get("SKETCH_PERSIST_INTERVAL", 10.0)),
+    max_pages=int(os.environ.get("SKETCH_MAX_PAGES", 500)),
+)
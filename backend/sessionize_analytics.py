@@ -0,0 +1,45 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from services.sessionization import SessionManager
+from config.database import db_manager
+from dotenv import load_dotenv
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+async def sessionize_analytics(days: int, chunk_days: int):
+    """Rebuild analytics_sessions for the last N days, a few days at a time.
+    
+    Each chunk replaces the sessions starting in it, so the command can be
+    re-run safely and memory stays bounded by the events in one chunk.
+    """
+    db = db_manager.get_database()
+    manager = SessionManager()
+    end = datetime.utcnow()
+    start = (end - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    total = 0
+    while start < end:
+        chunk_end = min(start + timedelta(days=chunk_days), end)
+        # Chunks share their boundary instant; the later chunk owns it
+        sessions = await manager.refresh(db, start, chunk_end - timedelta(microseconds=1) if chunk_end < end else end)
+        print(f"Sessionized {start:%Y-%m-%d} to {chunk_end:%Y-%m-%d}: {sessions} sessions")
+        total += sessions
+        start = chunk_end
+    
+    print(f"✅ Rebuilt {total} sessions")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild analytics sessions from raw events")
+    parser.add_argument("--days", type=int, default=30, help="Rebuild sessions starting in the last N days")
+    parser.add_argument("--chunk-days", type=int, default=7, help="Days of events loaded at a time")
+    args = parser.parse_args()
+    
+    await db_manager.connect(create_indexes=False)
+    await sessionize_analytics(args.days, args.chunk_days)
+    await db_manager.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -9,49 +9,70 @@ const AnalyticsTracker = () => {
     return Math.random().toString(36).substring(2, 15) + Math.random().toString(36).substring(2, 15);
   }
 
-  const trackPageView = async (page) => {
-    if (!isTracking.current) return;
-    
-    try {
-      await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/analytics/pageview`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          page: page,
-          user_agent: navigator.userAgent,
-          referrer: document.referrer || null,
-          session_id: sessionId.current
-        }),
-      });
-    } catch (error) {
-      console.error('Failed to track page view:', error);
-    }
+  const eventQueue = useRef([]);
+  const flushTimer = useRef(null);
+
+  const FLUSH_INTERVAL_MS = 5000;
+  const MAX_BATCH_SIZE = 50;
+
+  // Send all queued events as a single batch request. keepalive lets the
+  // request outlive the page when flushing during unload.
+  const flushEvents = () => {
+    clearTimeout(flushTimer.current);
+    flushTimer.current = null;
+
+    if (eventQueue.current.length === 0) return;
+    // Send each event's age rather than its time, so the server can place
+    // it without trusting the client's clock
+    const sentAt = Date.now();
+    const events = eventQueue.current.splice(0, eventQueue.current.length).map(
+      ({ queuedAt, ...event }) => ({ ...event, age_ms: sentAt - queuedAt })
+    );
+
+    fetch(`${process.env.REACT_APP_BACKEND_URL}/api/analytics/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ events }),
+      keepalive: true,
+    }).catch((error) => {
+      console.error('Failed to send analytics batch:', error);
+    });
   };
 
-  const trackInteraction = async (action, element = null, data = null) => {
+  const enqueueEvent = (event) => {
     if (!isTracking.current) return;
 
-    try {
-      await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/analytics/interaction`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          action: action,
-          element: element,
-          page: window.location.pathname,
-          session_id: sessionId.current,
-          data: data
-        }),
-      });
-    } catch (error) {
-      console.error('Failed to track interaction:', error);
+    eventQueue.current.push({ ...event, queuedAt: Date.now() });
+    if (eventQueue.current.length >= MAX_BATCH_SIZE) {
+      flushEvents();
+    } else if (!flushTimer.current) {
+      flushTimer.current = setTimeout(flushEvents, FLUSH_INTERVAL_MS);
     }
   };
 
+  const trackPageView = (page) => {
+    enqueueEvent({
+      type: 'pageview',
+      page: page,
+      user_agent: navigator.userAgent,
+      referrer: document.referrer || null,
+      session_id: sessionId.current
+    });
+  };
+
+  const trackInteraction = (action, element = null, data = null) => {
+    enqueueEvent({
+      type: 'interaction',
+      action: action,
+      element: element,
+      page: window.location.pathname,
+      session_id: sessionId.current,
+      data: data
+    });
+  };
+
   useEffect(() => {
     // Track initial page view
     trackPageView(window.location.pathname);
@@ -105,6 +126,7 @@ const AnalyticsTracker = () => {
         trackInteraction('page_hidden', null, {
           time_on_page: Date.now() - pageStartTime.current
         });
+        flushEvents();
       } else {
         trackInteraction('page_visible', null, null);
         pageStartTime.current = Date.now();
@@ -143,6 +165,7 @@ const AnalyticsTracker = () => {
       trackInteraction('session_end', null, {
         session_duration: Date.now() - pageStartTime.current
       });
+      flushEvents();
     };
 
     window.addEventListener('beforeunload', handleBeforeUnload);
@@ -155,6 +178,7 @@ const AnalyticsTracker = () => {
       document.removeEventListener('visibilitychange', handleVisibilityChange);
       window.removeEventListener('beforeunload', handleBeforeUnload);
       observer.disconnect();
+      flushEvents();
     };
   }, []);
 
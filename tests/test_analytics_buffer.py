@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from services.analytics_buffer import AnalyticsWriteBuffer
+
+
+class FakeCollection:
+    """insert_many stand-in: fails once with a connection error if asked,
+    then stores documents by _id and rejects the ones marked bad"""
+
+    def __init__(self, fail_first=False):
+        self.fail_first = fail_first
+        self.calls = 0
+        self.stored = {}
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        for document in documents:
+            document.setdefault("_id", id(document))
+        if self.fail_first and self.calls == 1:
+            # The first document made it before the connection dropped
+            self.stored[documents[0]["_id"]] = documents[0]
+            raise AutoReconnect("connection reset")
+        errors = []
+        for index, document in enumerate(documents):
+            if document["_id"] in self.stored:
+                errors.append({"index": index, "code": 11000})
+            elif document.get("bad"):
+                errors.append({"index": index, "code": 121})
+            else:
+                self.stored[document["_id"]] = document
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+class FakeDatabase(dict):
+    def __init__(self, collection):
+        super().__init__()
+        self.collection = collection
+
+    def __getitem__(self, name):
+        return self.collection
+
+
+async def _write(buffer, collection, documents):
+    hooked = []
+
+    async def hook(name, written):
+        hooked.extend(written)
+
+    buffer.add_flush_hook(hook)
+    await buffer.start(FakeDatabase(collection))
+    await buffer.put_many("page_views", documents)
+    await buffer.stop()
+    return hooked
+
+
+def test_partial_bulk_write_runs_hooks_for_stored_documents():
+    collection = FakeCollection()
+    buffer = AnalyticsWriteBuffer(flush_interval=0.01)
+    documents = [{"n": 0}, {"n": 1, "bad": True}, {"n": 2}]
+
+    hooked = asyncio.run(_write(buffer, collection, documents))
+
+    assert [document["n"] for document in hooked] == [0, 2]
+    assert buffer.written == 2
+    assert buffer.failed == 1
+
+
+def test_transient_failure_is_retried_and_duplicates_count_as_stored():
+    collection = FakeCollection(fail_first=True)
+    buffer = AnalyticsWriteBuffer(flush_interval=0.01, retry_backoff=0.001)
+    documents = [{"n": 0}, {"n": 1}, {"n": 2, "bad": True}]
+
+    hooked = asyncio.run(_write(buffer, collection, documents))
+
+    assert collection.calls == 2
+    assert buffer.retried == 1
+    assert [document["n"] for document in hooked] == [0, 1]
+    assert buffer.failed == 1
+
+
+def test_put_many_blocks_once_for_the_whole_batch():
+    async def run():
+        buffer = AnalyticsWriteBuffer(max_size=2, overflow="block", block_timeout=0.05)
+        # Accepting without a flusher, so the queue stays full
+        buffer._accepting = True
+        started = time.perf_counter()
+        accepted = await buffer.put_many("page_views", [{"n": n} for n in range(20)])
+        return accepted, time.perf_counter() - started, buffer
+
+    accepted, elapsed, buffer = asyncio.run(run())
+
+    assert [document["n"] for document in accepted] == [0, 1]
+    assert buffer.dropped == 18
+    assert elapsed < 0.5
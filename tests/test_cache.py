@@ -0,0 +1,74 @@
+from middleware.cache import MemoryCache
+
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # a is now the most recently used
+
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.evictions == 1
+
+
+def test_byte_budget_evicts_until_under_limit():
+    cache = MemoryCache(max_entries=100, max_bytes=10)
+    cache.set("a", "x" * 4)
+    cache.set("b", "x" * 4)
+    cache.set("c", "x" * 4)
+
+    assert cache.size() == 2
+    assert cache.total_bytes == 8
+    assert cache.get("a") is None
+
+
+def test_value_larger_than_cache_is_not_stored():
+    cache = MemoryCache(max_bytes=10)
+    cache.set("a", "x" * 11)
+
+    assert cache.size() == 0
+
+
+def test_invalidate_tags_removes_tagged_entries_only():
+    cache = MemoryCache()
+    cache.set("portfolio", "p", tags=("portfolio",))
+    cache.set("both", "b", tags=("portfolio", "contact"))
+    cache.set("contact", "c", tags=("contact",))
+
+    assert cache.invalidate_tags("portfolio") == 2
+
+    assert cache.get("portfolio") is None
+    assert cache.get("both") is None
+    assert cache.get("contact") == "c"
+
+
+def test_set_with_outdated_version_is_dropped():
+    cache = MemoryCache()
+    # A fetch reads the version, then a write invalidates before it stores
+    version = cache.tags_version(("portfolio",))
+    cache.invalidate_tags("portfolio")
+
+    cache.set("portfolio", "old", tags=("portfolio",), version=version)
+    assert cache.get("portfolio") is None
+
+    cache.set("portfolio", "new", tags=("portfolio",), version=cache.tags_version(("portfolio",)))
+    assert cache.get("portfolio") == "new"
+
+
+def test_expired_entry_is_served_stale_only_when_allowed(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("middleware.cache.time.time", lambda: now[0])
+    cache = MemoryCache()
+    cache.set("a", "1", ttl=10, stale_ttl=20)
+
+    now[0] += 15
+    assert cache.lookup("a") == (None, False)
+    assert cache.lookup("a", allow_stale=True) == ("1", True)
+
+    now[0] += 20
+    assert cache.lookup("a", allow_stale=True) == (None, False)
+    assert cache.size() == 0
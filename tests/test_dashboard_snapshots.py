@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime
+
+import orjson
+from starlette.requests import Request
+
+import routes.analytics
+from services.dashboard_snapshots import DashboardSnapshotManager, content_etag
+
+
+def _payload(views=10, day=1):
+    return {
+        "summary": {"total_views": views, "date_range": {"start": datetime(2026, 5, day), "end": datetime(2026, 6, day)}},
+        "daily_views": [{"date": "2026-05-01", "views": views}],
+    }
+
+
+class FakeSnapshots:
+    def __init__(self):
+        self.document = None
+        self.writes = 0
+
+    async def replace_one(self, query, document, upsert):
+        self.document = {"_id": query["_id"], **document}
+        self.writes += 1
+
+    async def find_one(self, query, projection=None):
+        return self.document
+
+
+def _manager(payloads):
+    snapshots = FakeSnapshots()
+    manager = DashboardSnapshotManager()
+
+    async def builder(database):
+        return payloads.pop(0)
+
+    manager.attach({"dashboard_snapshots": snapshots}, builder)
+    return manager, snapshots
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/analytics/dashboard",
+        "query_string": b"",
+        "headers": headers,
+    })
+
+
+def test_etag_ignores_the_sliding_window_but_not_the_content():
+    assert content_etag(_payload(day=1)) == content_etag(_payload(day=2))
+    assert content_etag(_payload(views=10)) != content_etag(_payload(views=11))
+    assert content_etag(_payload()).startswith('W/"')
+
+
+def test_unchanged_refresh_keeps_the_stored_snapshot():
+    manager, snapshots = _manager([_payload(day=1), _payload(day=2), _payload(views=11)])
+
+    async def refresh_three_times():
+        return [await manager.refresh() for _ in range(3)]
+
+    first, second, third = asyncio.run(refresh_three_times())
+
+    assert second is first
+    assert third.etag != first.etag
+    assert snapshots.writes == 2
+    assert manager.unchanged == 1
+
+
+def test_route_returns_304_for_a_matching_etag(monkeypatch):
+    manager, _ = _manager([_payload()])
+    monkeypatch.setattr(routes.analytics, "dashboard_snapshots", manager)
+
+    def get(if_none_match=None):
+        return asyncio.run(routes.analytics.get_analytics_dashboard(_request(if_none_match), db=None))
+
+    response = get()
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert orjson.loads(response.body)["summary"]["total_views"] == 10
+    assert response.headers["cache-control"] == "no-cache"
+
+    for header in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+        not_modified = get(header)
+        assert not_modified.status_code == 304
+        assert not_modified.body == b""
+        assert not_modified.headers["etag"] == etag
+
+    assert get('W/"other"').status_code == 200
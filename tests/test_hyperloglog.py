@@ -0,0 +1,57 @@
+import numpy as np
+
+from services.hyperloglog import HyperLogLog
+
+
+def _relative_errors(checkpoints, trials=4):
+    """Relative count error at each checkpoint, for several independent streams"""
+    errors = []
+    for trial in range(trials):
+        sketch = HyperLogLog(14)
+        added = 0
+        for checkpoint in checkpoints:
+            sketch.update(f"{trial}:{i}" for i in range(added, checkpoint))
+            added = checkpoint
+            errors.append(sketch.count() / checkpoint - 1)
+    return np.array(errors)
+
+
+def test_no_bias_across_the_small_to_large_range_transition():
+    # Raw HLL with a linear-counting switch at 2.5m overestimates by 2-3%
+    # just above m * 2.5 = 40960 at precision 14
+    errors = _relative_errors(range(30_000, 60_001, 2_500))
+
+    assert abs(errors.mean()) < 0.005
+    assert np.sqrt((errors ** 2).mean()) < 0.01
+    assert np.abs(errors).max() < 0.03
+
+
+def test_small_counts_are_near_exact():
+    sketch = HyperLogLog(14)
+    assert sketch.count() == 0
+    sketch.update(str(i) for i in range(100))
+    assert abs(sketch.count() - 100) <= 1
+
+
+def test_sparse_and_dense_sketches_agree_and_round_trip():
+    sparse = HyperLogLog(14)
+    dense = HyperLogLog(14)
+    dense._densify()
+    for i in range(3_000):
+        sparse.add(str(i))
+        dense.add(str(i))
+
+    assert sparse.sparse is not None
+    assert sparse.count() == dense.count()
+    assert HyperLogLog.from_bytes(sparse.to_bytes()).count() == sparse.count()
+    assert len(sparse.to_bytes()) < len(dense.to_bytes())
+
+
+def test_merge_is_a_union():
+    a = HyperLogLog(14)
+    b = HyperLogLog(14)
+    a.update(f"a{i}" for i in range(5_000))
+    b.update(f"b{i}" for i in range(5_000))
+    b.update(f"a{i}" for i in range(1_000))
+
+    assert abs(a.merge(b).count() / 10_000 - 1) < 0.03
@@ -0,0 +1,27 @@
+import logging
+import sys
+
+from config import logging_setup
+
+
+def test_uvicorn_loggers_go_through_the_queue(monkeypatch):
+    monkeypatch.setenv("LOG_FILE", "")
+    root = logging.getLogger()
+    saved = list(root.handlers), root.level
+    # What the uvicorn CLI sets up before importing the app
+    for name in ("uvicorn", "uvicorn.access"):
+        logging.getLogger(name).addHandler(logging.StreamHandler(sys.stderr))
+    logging.getLogger("uvicorn.access").propagate = False
+    try:
+        logging_setup.setup_logging()
+
+        for name in logging_setup.UVICORN_LOGGERS:
+            uvicorn_logger = logging.getLogger(name)
+            assert uvicorn_logger.handlers == []
+            assert uvicorn_logger.propagate
+        assert root.handlers == [logging_setup._queue_handler]
+    finally:
+        logging_setup.stop_logging()
+        logging_setup._queue_handler = None
+        root.handlers[:] = saved[0]
+        root.setLevel(saved[1])
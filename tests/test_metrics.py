@@ -0,0 +1,41 @@
+import threading
+from types import SimpleNamespace
+
+from config.metrics import MetricsRegistry
+from config.monitoring import command_metrics
+
+
+def test_export_while_another_thread_adds_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", "test", ("id",))
+    histogram = registry.histogram("h_seconds", "test", ("id",))
+    done = threading.Event()
+
+    def write():
+        for i in range(50_000):
+            with counter.lock:
+                counter.inc((str(i),))
+            with histogram.lock:
+                histogram.observe(0.01, (str(i),))
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    while not done.is_set():
+        registry.to_prometheus()
+        registry.to_json()
+    writer.join()
+
+    assert registry.value("c_total") == 50_000
+    assert len(registry.to_json()["h_seconds"]["samples"]) == 50_000
+
+
+def test_started_commands_keep_only_the_redacted_shape():
+    command = {"find": "page_views", "filter": {"visitor_id": "v-123", "timestamp": {"$gte": 5}}}
+    event = SimpleNamespace(command_name="find", command=command, connection_id=("db", 27017), request_id=7)
+    command_metrics.started(event)
+
+    name, collection, shape = command_metrics._started.pop((("db", 27017), 7))
+    assert (name, collection) == ("find", "page_views")
+    assert shape == {"filter": {"visitor_id": "?", "timestamp": {"$gte": "?"}}}
+    assert "v-123" not in repr(shape)
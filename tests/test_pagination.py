@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from routes.pagination import decode_cursor, encode_cursor, ndjson_response, paginate
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not document[field] < condition["$lt"]:
+                return False
+        elif document[field] != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+        self.closed = False
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    def limit(self, limit):
+        self.documents = self.documents[:limit]
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection):
+        return FakeCursor([dict(d) for d in self.documents if _matches(d, query)])
+
+
+def _request(query_string=b"", accept="application/json"):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "path": "/api/items",
+        "query_string": query_string,
+        "headers": [(b"accept", accept.encode())],
+    })
+
+
+def test_cursor_round_trips():
+    timestamp = datetime(2026, 3, 1, 12, 30, 15, 250000)
+    assert decode_cursor(encode_cursor(timestamp, "abc-123")) == (timestamp, "abc-123")
+
+
+def test_invalid_cursor_is_a_400():
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor("not-a-cursor")
+    assert raised.value.status_code == 400
+
+
+def test_pages_cover_every_document_once():
+    start = datetime(2026, 1, 1)
+    # Pairs of documents share a timestamp, so the id breaks ties across pages
+    documents = [{"id": f"{i:03d}", "timestamp": start + timedelta(seconds=i // 2)} for i in range(25)]
+    collection = FakeCollection(documents)
+
+    seen, token = [], None
+    while True:
+        response = asyncio.run(paginate(_request(), collection, {}, {}, "timestamp", 4, token))
+        page = orjson.loads(response.body)
+        seen.extend(document["id"] for document in page)
+        token = response.headers.get("x-next-cursor")
+        if token is None:
+            break
+        assert f"cursor={token}" in response.headers["link"]
+
+    assert seen == [f"{i:03d}" for i in reversed(range(25))]
+
+
+def test_ndjson_stream_closes_the_cursor_when_abandoned():
+    cursor = FakeCursor([{"id": str(i)} for i in range(5)])
+    response = ndjson_response(cursor)
+
+    async def read_first_chunk():
+        chunks = response.body_iterator
+        first = await chunks.__anext__()
+        # What Starlette does when the client disconnects mid-stream
+        await chunks.aclose()
+        return first
+
+    first = asyncio.run(read_first_chunk())
+    assert first.count(b"\n") == 5
+    assert cursor.closed
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from middleware.rate_limiting import (
+    MemoryRateLimitStore, RateLimiter, RateLimitMiddleware, SharedRateLimitStore
+)
+
+
+@pytest.fixture(params=["memory", "shared"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryRateLimitStore()
+    return SharedRateLimitStore(str(tmp_path / "ratelimit.bin"), slots=1024)
+
+
+def test_burst_then_denied_with_retry_after(store):
+    # 60/min refills one request per second; a burst of 3 goes through at once
+    limiter = RateLimiter(requests_per_minute=60, burst=3, store=store)
+    now = 1000.0
+
+    assert [limiter.check("client", now)[0] for _ in range(3)] == [True, True, True]
+    assert limiter.check("client", now) == (False, 1)
+    assert limiter.check("other", now) == (True, 0)
+
+    # One emission interval later exactly one more request is allowed
+    assert limiter.check("client", now + 1.0) == (True, 0)
+    assert limiter.check("client", now + 1.0)[0] is False
+
+
+def test_retry_after_rounds_up_to_whole_seconds(store):
+    limiter = RateLimiter(requests_per_minute=5, burst=1, store=store)
+
+    assert limiter.check("client", 1000.0) == (True, 0)
+    # The next slot opens 12s later
+    assert limiter.check("client", 1000.5) == (False, 12)
+    assert limiter.check("client", 1012.0) == (True, 0)
+
+
+def test_idle_clients_are_evicted():
+    store = MemoryRateLimitStore()
+    limiter = RateLimiter(requests_per_minute=60, store=store)
+    for i in range(10):
+        limiter.check(f"client-{i}", 1000.0)
+
+    assert store.evict_idle(1000.5) == 0
+    assert store.evict_idle(1002.0) == 10
+    assert store.clients == {}
+
+
+def test_store_keeps_max_clients_dropping_least_recent():
+    store = MemoryRateLimitStore(max_clients=3)
+    limiter = RateLimiter(requests_per_minute=60, store=store)
+    for client in ("a", "b", "c", "a", "d"):
+        limiter.check(client, 1000.0)
+
+    assert list(store.clients) == ["default:c", "default:a", "default:d"]
+
+
+def test_middleware_rejects_with_429_and_retry_after():
+    limiter = RateLimiter(requests_per_minute=60, burst=1)
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    middleware = RateLimitMiddleware(app, routes=[("*", "/api/*", "general")], policies={"general": limiter})
+    scope = {"type": "http", "method": "GET", "path": "/api/portfolio", "headers": [], "client": ("10.0.0.1", 1)}
+
+    async def request():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, None, send)
+        return sent
+
+    assert asyncio.run(request()) == []
+    rejected = asyncio.run(request())
+
+    assert calls == ["/api/portfolio"]
+    assert rejected[0]["status"] == 429
+    assert (b"retry-after", b"1") in rejected[0]["headers"]
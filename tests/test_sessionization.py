@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from services.sessionization import EventColumns, SessionManager, build_sessions, session_doc_id
+
+T0 = datetime(2026, 5, 4, 9, 0)
+
+
+def _at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+def _ms(timestamp):
+    return (timestamp - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+
+
+def _columns():
+    columns = EventColumns()
+    columns.add_page_views([
+        {"session_id": "s1", "page": "/", "timestamp": _at(0), "user_agent": "ua-1", "ip_address": "10.0.0.1"},
+        {"session_id": "s1", "page": "/about", "timestamp": _at(60)},
+        {"session_id": "s1", "page": "/", "timestamp": _at(80)},
+        # Over the 30 minute timeout after the last event: a new session
+        {"session_id": "s1", "page": "/", "timestamp": _at(7200), "user_agent": "ua-2"},
+        # No session id: keyed by the visitor identity
+        {"page": "/projects", "timestamp": _at(30), "user_agent": "ua-3", "ip_address": "10.0.0.3"},
+    ])
+    columns.add_interactions([
+        {"session_id": "s1", "page": "/about", "action": "click", "timestamp": _at(90)},
+        {"session_id": "s1", "page": "/about", "action": "page_hidden", "timestamp": _at(100)},
+        {"session_id": "s2", "page": "/", "action": "click", "timestamp": _at(10)},
+        # Unattributable without a session id
+        {"page": "/", "action": "click", "timestamp": _at(20)},
+    ])
+    return columns
+
+
+def test_build_sessions_on_a_fixed_input():
+    sessions = {(s["session_id"], s["start_time"]): s for s in build_sessions(_columns())}
+
+    assert sorted(sessions) == [
+        ("10.0.0.3|ua-3", _at(30)), ("s1", _at(0)), ("s1", _at(7200)), ("s2", _at(10)),
+    ]
+
+    first = sessions["s1", _at(0)]
+    assert first["id"] == session_doc_id("s1", _ms(_at(0)))
+    assert first["end_time"] == _at(100)
+    assert first["total_duration"] == 100
+    assert first["pages_visited"] == ["/", "/about"]
+    assert first["interactions_count"] == 1
+    assert not first["is_bounce"]
+    assert (first["user_agent"], first["ip_address"]) == ("ua-1", "10.0.0.1")
+
+    second = sessions["s1", _at(7200)]
+    assert second["pages_visited"] == ["/"]
+    assert (second["total_duration"], second["interactions_count"], second["is_bounce"]) == (0, 0, True)
+    assert second["user_agent"] == "ua-2"
+
+    anonymous = sessions["10.0.0.3|ua-3", _at(30)]
+    assert anonymous["pages_visited"] == ["/projects"]
+    assert anonymous["ip_address"] == "10.0.0.3"
+
+    # Interactions only: no page view to take the visitor details from
+    interactions_only = sessions["s2", _at(10)]
+    assert interactions_only["pages_visited"] == []
+    assert interactions_only["user_agent"] is None
+    assert interactions_only["interactions_count"] == 1
+    assert not interactions_only["is_bounce"]
+
+
+def test_build_sessions_filters_by_start():
+    sessions = build_sessions(_columns(), since=_at(60))
+
+    assert [(s["session_id"], s["start_time"]) for s in sessions] == [("s1", _at(7200))]
+    assert build_sessions(EventColumns()) == []
+
+
+class FakeSessions:
+    def __init__(self, documents):
+        self.documents = {document["id"]: document for document in documents}
+        self.operations = []
+
+    async def bulk_write(self, requests, ordered):
+        self.operations.append("bulk_write")
+        for request in requests:
+            self.documents[request._filter["id"]] = dict(request._doc)
+
+    async def delete_many(self, query):
+        self.operations.append("delete_many")
+        window, refreshed_at = query["start_time"], query["refreshed_at"]["$ne"]
+        self.documents = {
+            key: document for key, document in self.documents.items()
+            if not (window["$gte"] <= document["start_time"] <= window["$lte"]
+                    and document.get("refreshed_at") != refreshed_at)
+        }
+
+
+class FakeEvents:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length):
+        documents, self.documents = self.documents, []
+        return documents
+
+
+def test_refresh_upserts_before_removing_stale_sessions():
+    session_id = session_doc_id("s1", _ms(_at(0)))
+    sessions = FakeSessions([
+        {"id": session_id, "session_id": "s1", "start_time": _at(0), "pages_visited": ["/"]},
+        # No longer produced by the events, so removed
+        {"id": "gone", "session_id": "old", "start_time": _at(5)},
+        # Outside the refreshed window, so untouched
+        {"id": "kept", "session_id": "older", "start_time": T0 - timedelta(days=2)},
+    ])
+    database = {
+        "page_views": FakeEvents([
+            {"session_id": "s1", "page": "/", "timestamp": _at(0)},
+            {"session_id": "s1", "page": "/about", "timestamp": _at(60)},
+        ]),
+        "user_interactions": FakeEvents([]),
+        "analytics_sessions": sessions,
+    }
+
+    written = asyncio.run(SessionManager().refresh(database, T0, _at(3600)))
+
+    assert written == 1
+    assert sessions.operations == ["bulk_write", "delete_many"]
+    assert set(sessions.documents) == {session_id, "kept"}
+    assert sessions.documents[session_id]["pages_visited"] == ["/", "/about"]
@@ -0,0 +1,54 @@
+import errno
+import os
+
+from middleware.cache import CachedBody
+from middleware.shared_cache import SharedCache
+
+
+def _cache(tmp_path, **options):
+    return SharedCache(directory=str(tmp_path), **options)
+
+
+def test_failed_write_is_logged_not_raised(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+
+    def full(*args, **kwargs):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr("middleware.shared_cache.tempfile.mkstemp", full)
+    cache.set("a", CachedBody(b"{}"))
+
+    assert cache.get("a") is None
+
+
+def test_corrupt_entry_is_a_miss_and_is_removed(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("a", CachedBody(b'{"ok": true}'))
+    path = cache._path("a")
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+    cache._local.clear()
+
+    assert cache.lookup("a") == (None, False)
+    assert not os.path.exists(path)
+
+
+def test_set_keeps_the_byte_budget_without_waiting_for_a_sweep(tmp_path):
+    cache = _cache(tmp_path, max_bytes=2_000)
+    for key in "abcdef":
+        cache.set(key, CachedBody(b"x" * 500))
+        cache._usage = None  # measure the directory after every write
+
+        assert cache.usage()[1] <= cache.max_bytes
+
+    assert cache.get("f") is not None
+    assert cache.get("a") is None
+
+
+def test_invalidate_tags_returns_purged_count(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("a", CachedBody(b"1"), tags=("portfolio",))
+    cache.set("b", CachedBody(b"2"), tags=("contact",))
+
+    assert cache.invalidate_tags("portfolio") == 1
+    assert cache.get("b") is not None
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from middleware.cache import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(flight.run("k", fetch) for _ in range(5)))
+        return results, calls, flight
+
+    results, calls, flight = asyncio.run(run())
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert flight.coalesced == 4
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flight.run("k", fail) for _ in range(3)), return_exceptions=True)
+
+        async def succeed():
+            return "ok"
+
+        return results, await flight.run("k", succeed)
+
+    results, retried = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == "ok"
+
+
+def test_cancelled_leader_hands_the_fetch_to_a_waiter():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch(tag):
+            calls.append(tag)
+            await asyncio.sleep(0.05)
+            return tag
+
+        leader = asyncio.create_task(flight.run("k", lambda: fetch("leader")))
+        await asyncio.sleep(0)
+        followers = [
+            asyncio.create_task(flight.run("k", lambda tag=f"follower-{i}": fetch(tag)))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return results, calls, flight
+
+    results, calls, flight = asyncio.run(run())
+
+    # One follower took over; the others joined its flight instead of failing
+    assert len(set(results)) == 1 and results[0].startswith("follower-")
+    assert calls == ["leader", results[0]]
+    assert flight.stats()["inflight"] == 0